@@ -0,0 +1,103 @@
+"""
+Compares SpecFormatter.collect_refs against the original list-queue, recursive
+implementation, both for one closure over all paths (cold) and for a closure
+per operation reusing one formatter (the memoized ref graph is warm).
+
+    python -m benchmarks.collect_refs
+    python -m benchmarks.collect_refs --spec stripe.json --repeat 3
+"""
+
+import argparse
+import json
+
+from restly.utils import SpecFormatter
+
+from .synthetic import generate_spec
+from .timing import best_of, report
+
+
+def legacy_collect_refs(spec: dict, start_node: dict) -> set[str]:
+    queue = [start_node]
+    result = set()
+
+    while len(queue) > 0:
+        node = queue.pop(0)
+        refs = _legacy_collect_refs_from_node(node)
+        for ref in refs:
+            if ref not in result:
+                result.add(ref)
+                ref_node = _legacy_get_node(spec, ref[2:].split("/"))
+                queue.append(ref_node)
+    return result
+
+
+def _legacy_collect_refs_from_node(node: dict) -> list[str]:
+    result = []
+    if "$ref" in node:
+        result.append(node["$ref"])
+    else:
+        for key in node:
+            if isinstance(node[key], dict):
+                result.extend(_legacy_collect_refs_from_node(node[key]))
+            elif isinstance(node[key], list):
+                for item in node[key]:
+                    if isinstance(item, dict):
+                        result.extend(_legacy_collect_refs_from_node(item))
+    return result
+
+
+def _legacy_get_node(node: dict, path: list[str]):
+    if len(path) == 0:
+        return node
+    return _legacy_get_node(node[path[0]], path[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spec", help="path to a JSON spec (default: synthetic)")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--schemas", type=int, default=5000)
+    parser.add_argument("--per-operation", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    else:
+        spec = generate_spec(operations=args.operations, schemas=args.schemas)
+
+    trimmed_spec = SpecFormatter(spec).trim_paths_only()
+
+    legacy_time, legacy_refs = best_of(
+        args.repeat, lambda: legacy_collect_refs(spec, trimmed_spec)
+    )
+    new_time, new_refs = best_of(
+        args.repeat, lambda: SpecFormatter(spec).collect_refs(trimmed_spec)
+    )
+    assert legacy_refs == new_refs, "implementations disagree"
+
+    print(f"refs collected: {len(new_refs)}")
+    report("all paths", legacy_time, new_time)
+
+    operations = [
+        {"paths": {path: {verb: operation}}}
+        for path, path_item in trimmed_spec["paths"].items()
+        for verb, operation in path_item.items()
+    ][: args.per_operation]
+
+    legacy_time, legacy_refs = best_of(
+        args.repeat, lambda: [legacy_collect_refs(spec, op) for op in operations]
+    )
+
+    def per_operation():
+        formatter = SpecFormatter(spec)
+        return [formatter.collect_refs(op) for op in operations]
+
+    new_time, new_refs = best_of(args.repeat, per_operation)
+    assert legacy_refs == new_refs, "implementations disagree"
+    report(f"{len(operations)} operations", legacy_time, new_time)
+
+
+if __name__ == "__main__":
+    main()
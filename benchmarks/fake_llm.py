@@ -0,0 +1,153 @@
+"""
+OpenAI-compatible stand-in for /v1/chat/completions that streams a fixed
+number of tokens at a fixed rate, so that streaming can be load tested without
+an API key or rate limits. Point the app at it with OPENAI_BASE_URL.
+
+    python -m benchmarks.fake_llm --port 8100 --tokens 200 --tokens-per-second 50
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake flask run
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class FakeLLM:
+    # Streamed completions
+    tokens: int = 200
+    tokens_per_second: float = 50.0
+    # Delay before the first token, like a real model reading the prompt
+    first_token_delay: float = 0.2
+    # Body of non-streamed completions, e.g. for relevant-apis
+    completion: str = '{"apis": []}'
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            if request.get("stream"):
+                await self._stream(request, writer)
+            else:
+                self._respond(request, writer)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        body = await reader.readexactly(length)
+        return json.loads(body) if body else {}
+
+    def _respond(self, request: dict, writer: asyncio.StreamWriter):
+        body = json.dumps(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": self.completion},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+
+    async def _stream(self, request: dict, writer: asyncio.StreamWriter):
+        # No Content-Length: the body ends when the connection closes
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        await writer.drain()
+        await asyncio.sleep(self.first_token_delay)
+
+        interval = 1 / self.tokens_per_second
+        start = time.monotonic()
+        for i in range(self.tokens):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": f"token{i} "},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            writer.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+            # Scheduled against the start time so that the rate does not drift
+            await asyncio.sleep(max(0.0, start + (i + 1) * interval - time.monotonic()))
+        writer.write(b"data: [DONE]\n\n")
+
+
+def serve_fake_llm(
+    llm: FakeLLM, port: int = 0
+) -> tuple[asyncio.AbstractEventLoop, str]:
+    """
+    Runs the server on a daemon thread. Returns its loop and the base URL to use
+    as OPENAI_BASE_URL.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = {}
+
+    async def start():
+        server = await asyncio.start_server(llm.handle, "127.0.0.1", port, backlog=4096)
+        address["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+        await server.serve_forever()
+
+    threading.Thread(
+        target=loop.run_until_complete, args=(start(),), daemon=True
+    ).start()
+    started.wait()
+    return loop, f"http://127.0.0.1:{address['port']}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    llm = FakeLLM(
+        tokens=args.tokens,
+        tokens_per_second=args.tokens_per_second,
+        first_token_delay=args.first_token_delay,
+    )
+    _, base_url = serve_fake_llm(llm, args.port)
+    print(f"OPENAI_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Fixture:
+    """
+    A canned response served by the stand-in server.
+    """
+
+    def __init__(self, body: bytes, headers: dict[str, str] = None, status: int = 200):
+        self.body = body
+        self.headers = headers or {}
+        self.status = status
+
+
+def serve_fixtures(fixtures: dict[str, Fixture]) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Starts a local HTTP server on a free port serving the fixtures by path and
+    returns it with its base URL. Call shutdown() on the server when done.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fixture = fixtures.get(self.path)
+            if fixture is None:
+                self.send_error(404)
+                return
+            self.send_response(fixture.status)
+            for key, value in fixture.headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(fixture.body)))
+            self.end_headers()
+            try:
+                self.wfile.write(fixture.body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up, e.g. after hitting its size limit
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
@@ -0,0 +1,84 @@
+"""
+Exercises restly.ingest.fetch_spec against a local stand-in HTTP server with
+large fixtures (plain, gzip and brotli JSON, YAML, oversized plain and gzip), reporting wall
+time and peak traced memory per fixture.
+
+    python -m benchmarks.ingest --operations 20000 --schemas 20000
+"""
+
+import argparse
+import gzip
+import json
+import time
+import tracemalloc
+
+import brotli
+import yaml
+
+from restly.ingest import SpecFetchError, fetch_spec
+
+from .http_server import Fixture, serve_fixtures
+from .synthetic import generate_spec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operations", type=int, default=10000)
+    parser.add_argument("--schemas", type=int, default=10000)
+    parser.add_argument("--max-bytes", type=int, default=256 * 1024**2)
+    args = parser.parse_args()
+
+    spec = generate_spec(operations=args.operations, schemas=args.schemas)
+    body = json.dumps(spec).encode()
+    json_headers = {"Content-Type": "application/json"}
+    fixtures = {
+        "/spec.json": Fixture(body, json_headers),
+        "/spec.json.gz": Fixture(
+            gzip.compress(body), {**json_headers, "Content-Encoding": "gzip"}
+        ),
+        "/spec.json.br": Fixture(
+            brotli.compress(body, quality=5), {**json_headers, "Content-Encoding": "br"}
+        ),
+        "/spec.yaml": Fixture(
+            yaml.safe_dump(spec).encode(), {"Content-Type": "application/yaml"}
+        ),
+        "/oversized.json": Fixture(
+            body + b" " * args.max_bytes, {"Content-Type": "application/json"}
+        ),
+        # Small on the wire, so only the decompressed size gives it away
+        "/oversized.json.gz": Fixture(
+            gzip.compress(body + b" " * args.max_bytes),
+            {**json_headers, "Content-Encoding": "gzip"},
+        ),
+    }
+    server, base_url = serve_fixtures(fixtures)
+    print(f"spec size: {len(body) / 1024**2:.1f} MiB")
+
+    try:
+        for path, fixture in fixtures.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                fetched = fetch_spec(
+                    base_url + path,
+                    max_bytes=args.max_bytes,
+                    connect_timeout=5,
+                    read_timeout=30,
+                    total_timeout=300,
+                )
+                outcome = "ok" if fetched.content == spec else "MISMATCH"
+            except SpecFetchError as e:
+                outcome = f"rejected: {e}"
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{path:20} {len(fixture.body) / 1024**2:8.1f} MiB on the wire "
+                f"{elapsed * 1000:9.1f} ms  peak {peak / 1024**2:8.1f} MiB  {outcome}"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Compares how the tutorial prompt's spec slice is assembled on a cold cache: by
+parsing the whole stored paths, ref graph and components of a spec (the legacy
+index layout), against loading only the stored operations and ref graph
+components of the selected APIs.
+
+    python -m benchmarks.narrow
+    python -m benchmarks.narrow --spec stripe.json --apis 5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from restly.cache import LRUCache
+from restly.types import ApiEndpoint
+from restly.utils import HTTP_METHODS, SpecFormatter
+
+from .synthetic import generate_spec
+
+
+def legacy_index(content: dict) -> dict:
+    """
+    The serialized spec_index columns the legacy lookups parsed.
+    """
+    formatter = SpecFormatter(content)
+    trimmed_spec = formatter.trim_paths_only() or {"paths": {}}
+    ref_graph = formatter.ref_graph(trimmed_spec)
+    return {
+        "paths": json.dumps(trimmed_spec),
+        "ref_graph": json.dumps(ref_graph),
+        "components": json.dumps(
+            {ref: formatter.resolve_ref(ref) for ref in ref_graph}
+        ),
+    }
+
+
+def legacy_slice(
+    cache: LRUCache, index: dict, apis: list[ApiEndpoint]
+) -> tuple[dict, dict]:
+    """
+    The legacy lookups, caching the parsed columns and results they cached.
+    """
+    key = tuple(sorted({(api.path, api.verb.lower()) for api in apis}))
+
+    def column(name):
+        return cache.get_or_compute(name, lambda: json.loads(index[name]))
+
+    def collect_refs():
+        ref_graph = column("ref_graph")
+        queue = [
+            ref
+            for path_item in narrowed["paths"].values()
+            for operation in path_item.values()
+            for ref in SpecFormatter._collect_refs_from_node(operation)
+        ]
+        refs = set()
+        while queue:
+            ref = queue.pop()
+            if ref not in refs:
+                refs.add(ref)
+                queue.extend(ref_graph.get(ref, []))
+        return frozenset(refs)
+
+    def select_nodes():
+        components = column("components")
+        refs = cache.get_or_compute(("collect_refs", key), collect_refs)
+        return SpecFormatter.project_nodes({ref: components[ref] for ref in refs})
+
+    narrowed = cache.get_or_compute(
+        ("narrow_api_list", key),
+        lambda: SpecFormatter(column("paths")).narrow_api_list(apis),
+    )
+    return narrowed, cache.get_or_compute(("select_nodes", key), select_nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spec", help="path to a JSON spec (default: synthetic)")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--schemas", type=int, default=1000)
+    parser.add_argument(
+        "--fanout", type=int, default=3, help="Refs per schema (at least 2)"
+    )
+    parser.add_argument("--apis", type=int, default=10, help="Selected per request")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            content = json.load(f)
+    else:
+        content = generate_spec(
+            operations=args.operations, schemas=args.schemas, fanout=args.fanout
+        )
+
+    # Set before importing the app, whose config reads it at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite"
+    from restly.app import create_app
+    from restly.db import db
+    from restly.models import Spec, SpecBlob, User, hash_token
+    from restly.spec_index import (
+        narrow_api_list,
+        refresh_spec_index,
+        select_nodes,
+        spec_cache,
+    )
+
+    app = create_app()
+    with app.app_context():
+        db.engine.echo = False
+        db.create_all()
+        user = User(token_hash=hash_token("benchmark"))
+        db.session.add(user)
+        db.session.flush()
+        blob = SpecBlob.get_or_create(json.dumps(content))
+        spec = Spec(name="benchmark", url="", content_hash=blob.sha256, user_id=user.id)
+        db.session.add(spec)
+        db.session.commit()
+
+        start = time.perf_counter()
+        refresh_spec_index(spec, content)
+        print(f"index build:  {(time.perf_counter() - start) * 1000:10.1f} ms")
+        legacy = legacy_index(content)
+        print(f"legacy index: {sum(map(len, legacy.values())) / 1024:10.1f} KiB")
+
+        operations = [
+            ApiEndpoint(path=path, verb=verb.upper())
+            for path, path_item in content["paths"].items()
+            for verb in path_item
+            if verb in HTTP_METHODS
+        ]
+        rng = random.Random(args.seed)
+        selections = [
+            rng.sample(operations, min(args.apis, len(operations)))
+            for _ in range(args.requests)
+        ]
+
+        legacy_cache = LRUCache(max_bytes=app.config["SPEC_CACHE_MAX_BYTES"])
+
+        def run(label, assemble):
+            latencies = []
+            for apis in selections:
+                spec_cache.clear()
+                legacy_cache.clear()
+                start = time.perf_counter()
+                assemble(apis)
+                latencies.append(time.perf_counter() - start)
+            print(
+                f"  {label:<10}{statistics.mean(latencies) * 1000:>10.2f}"
+                f"{statistics.quantiles(latencies, n=20)[-1] * 1000:>10.2f}"
+            )
+            return statistics.mean(latencies)
+
+        for apis in selections[:5]:
+            assert legacy_slice(legacy_cache, legacy, apis) == (
+                narrow_api_list(spec, apis),
+                select_nodes(spec, apis),
+            ), "implementations disagree"
+
+        print(f"\n{args.apis} APIs per request, cold cache:")
+        print(f"  {'':<10}{'mean ms':>10}{'p95 ms':>10}")
+        legacy_time = run(
+            "legacy", lambda apis: legacy_slice(legacy_cache, legacy, apis)
+        )
+        new_time = run(
+            "current",
+            lambda apis: (narrow_api_list(spec, apis), select_nodes(spec, apis)),
+        )
+        print(f"  speedup: {legacy_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Seeds a synthetic dataset and reports query counts and latencies for the
+per-user lookup and listing endpoints, first without and then with the indexes
+that serve them, along with the query plan of the listing query.
+
+    python -m benchmarks.queries
+    python -m benchmarks.queries --database-url postgresql://localhost/scratch
+
+The database is assumed to be a scratch one: its tables are dropped and
+recreated from the models.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+
+from .synthetic import generate_spec
+
+# Index names from restly.models, dropped for the "before" run
+BENCHMARKED_INDEXES = [
+    "ix_spec_user_id_id",
+    "ix_tutorial_user_id_id",
+    "ix_tutorial_spec_id",
+    "ix_spec_ingest_job_spec_id",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--specs", type=int, default=20, help="Per user")
+    parser.add_argument("--tutorials", type=int, default=50, help="Per user")
+    parser.add_argument("--requests", type=int, default=200, help="Per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite"
+
+    # Set before importing the app, whose config reads it at import time
+    os.environ["DATABASE_URL"] = database_url
+    from restly.app import create_app
+    from restly.db import db
+
+    app = create_app()
+    with app.app_context():
+        db.engine.echo = False
+        print(f"database: {db.engine.url.render_as_string(hide_password=True)}")
+        start = time.perf_counter()
+        fixtures = seed(db, args)
+        print(f"seeded in {time.perf_counter() - start:.1f} s")
+
+        indexes = benchmarked_indexes()
+        for index in indexes:
+            index.drop(db.engine)
+        run(app, db, fixtures, args, "without indexes")
+        for index in indexes:
+            index.create(db.engine)
+        analyze(db)
+        run(app, db, fixtures, args, "with indexes")
+
+
+def seed(db, args) -> dict:
+    from restly.models import (
+        Spec,
+        SpecBlob,
+        Tutorial,
+        User,
+        generate_user_token,
+        hash_token,
+    )
+
+    db.drop_all()
+    db.create_all()
+
+    rng = random.Random(args.seed)
+    tokens = [generate_user_token() for _ in range(args.users)]
+    db.session.execute(
+        insert(User), [{"token_hash": hash_token(token)} for token in tokens]
+    )
+    user_ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+
+    content = json.dumps(generate_spec(operations=20, schemas=20, seed=args.seed))
+    blob = SpecBlob.get_or_create(content)
+    db.session.flush()
+
+    # Rows of different users are interleaved, as they are in production
+    db.session.execute(
+        insert(Spec),
+        [
+            {
+                "name": f"Spec {i} - 1.0.0",
+                "url": f"https://example.com/{user_id}/{i}.json",
+                "content_hash": blob.sha256,
+                "user_id": user_id,
+            }
+            for i in range(args.specs)
+            for user_id in user_ids
+        ],
+    )
+    specs_by_user = {}
+    for spec_id, user_id in db.session.execute(db.select(Spec.id, Spec.user_id)):
+        specs_by_user.setdefault(user_id, []).append(spec_id)
+
+    relevant_apis = json.dumps({"apis": [{"path": "/resource0", "verb": "get"}]})
+    db.session.execute(
+        insert(Tutorial),
+        [
+            {
+                "name": f"Tutorial {i}",
+                "input": "How do I list resources?",
+                "relevant_apis": relevant_apis,
+                "content": "Lorem ipsum dolor sit amet. " * 80,
+                "spec_id": rng.choice(specs_by_user[user_id]),
+                "user_id": user_id,
+            }
+            for i in range(args.tutorials)
+            for user_id in user_ids
+        ],
+    )
+    tutorials_by_user = {}
+    for tutorial_id, user_id in db.session.execute(
+        db.select(Tutorial.id, Tutorial.user_id)
+    ):
+        tutorials_by_user.setdefault(user_id, []).append(tutorial_id)
+    db.session.commit()
+    analyze(db)
+
+    return {
+        "tokens": dict(zip(user_ids, tokens)),
+        "specs": specs_by_user,
+        "tutorials": tutorials_by_user,
+    }
+
+
+def run(app, db, fixtures: dict, args, label: str):
+    rng = random.Random(args.seed)
+    samples = [rng.choice(list(fixtures["tokens"])) for _ in range(args.requests)]
+
+    def headers(user_id):
+        return {"Authorization": f"Bearer {fixtures['tokens'][user_id]}"}
+
+    def middle(ids):
+        return sorted(ids)[len(ids) // 2]
+
+    endpoints = {
+        "list specs": lambda u: "/api/v1/specs",
+        "list specs (page 2)": lambda u: f"/api/v1/specs?after={middle(fixtures['specs'][u])}",
+        "get spec": lambda u: f"/api/v1/specs/{rng.choice(fixtures['specs'][u])}",
+        "spec status": lambda u: f"/api/v1/specs/{rng.choice(fixtures['specs'][u])}/status",
+        "list tutorials": lambda u: "/api/v1/tutorials",
+        "get tutorial": lambda u: f"/api/v1/tutorials/{rng.choice(fixtures['tutorials'][u])}",
+    }
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    client = app.test_client()
+    # Warm the auth cache so that counts only cover the endpoint itself
+    for user_id in set(samples):
+        client.get("/", headers=headers(user_id))
+        client.get(endpoints["list specs"](user_id), headers=headers(user_id))
+
+    print(f"\n{label}:")
+    print(f"  {'endpoint':<22}{'queries':>9}{'mean ms':>10}{'p95 ms':>10}")
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        for name, path in endpoints.items():
+            statements.clear()
+            latencies = []
+            for user_id in samples:
+                url = path(user_id)
+                start = time.perf_counter()
+                response = client.get(url, headers=headers(user_id))
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, (url, response.status_code)
+            if name == "list specs (page 2)":
+                list_statement = statements[-1]
+            print(
+                f"  {name:<22}{len(statements) / len(samples):>9.1f}"
+                f"{statistics.mean(latencies) * 1000:>10.2f}"
+                f"{statistics.quantiles(latencies, n=20)[-1] * 1000:>10.2f}"
+            )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    print("  plan of the spec listing query:")
+    for line in explain(db, *list_statement):
+        print(f"    {line}")
+
+
+def explain(db, statement: str, parameters) -> list[str]:
+    prefix = "EXPLAIN QUERY PLAN " if db.engine.dialect.name == "sqlite" else "EXPLAIN "
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + statement, parameters).all()
+    return [" ".join(str(value) for value in row) for row in rows]
+
+
+def analyze(db):
+    # Refresh planner statistics so that new indexes are considered
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def benchmarked_indexes() -> list:
+    from restly.models import Spec, SpecIngestJob, Tutorial
+
+    tables = [Spec.__table__, Tutorial.__table__, SpecIngestJob.__table__]
+    return [
+        index
+        for table in tables
+        for index in table.indexes
+        if index.name in BENCHMARKED_INDEXES
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures the keyword retrieval stage of relevant-apis: time to build the BM25
+index, its stored size, query latency, and how much smaller the relevant-apis
+prompt gets when only the top candidates are sent instead of the whole spec.
+
+    python -m benchmarks.retrieval
+    python -m benchmarks.retrieval --spec stripe.json --query "refund a charge"
+"""
+
+import argparse
+import json
+import time
+
+from restly.prompts import RELEVANT_APIS_PROMPT
+from restly.search import build_search_index, search_operations
+from restly.utils import SpecFormatter
+
+from .synthetic import generate_spec
+from .timing import best_of
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spec", help="path to a JSON spec (default: synthetic)")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--schemas", type=int, default=1000)
+    parser.add_argument("--query", default="update resource 42 and expand it")
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    else:
+        spec = generate_spec(operations=args.operations, schemas=args.schemas)
+
+    formatter = SpecFormatter(spec)
+    build_time, index = best_of(
+        args.repeat, lambda: build_search_index(formatter, spec)
+    )
+    stored = json.dumps(index)
+    print(f"operations:   {len(index['operations'])}")
+    print(f"terms:        {len(index['postings'])}")
+    print(f"index build:  {build_time * 1000:10.1f} ms")
+    print(f"index size:   {len(stored) / 1024:10.1f} KiB")
+
+    # What a request pays on a cold cache: parsing the stored index, then ranking
+    start = time.perf_counter()
+    json.loads(stored)
+    parse_time = time.perf_counter() - start
+    query_time, results = best_of(
+        args.repeat, lambda: search_operations(index, args.query, args.candidates)
+    )
+    print(f"index parse:  {parse_time * 1000:10.1f} ms")
+    print(f"query:        {query_time * 1000:10.1f} ms")
+    print(f"top matches for {args.query!r}:")
+    for api, score in results[:5]:
+        print(f"  {score:6.2f}  {api.verb} {api.path}")
+
+    full = json.dumps(formatter.trim_paths_only())
+    apis = [api for api, _ in results]
+    narrowed = json.dumps(formatter.narrow_api_list(apis))
+    full_prompt = RELEVANT_APIS_PROMPT.format(query=args.query, spec=full, count=10)
+    narrowed_prompt = RELEVANT_APIS_PROMPT.format(
+        query=args.query, spec=narrowed, count=10
+    )
+    print("relevant-apis prompt:")
+    print(f"  whole spec:     {len(full_prompt):12,} chars")
+    print(
+        f"  {len(apis)} candidates:  {len(narrowed_prompt):12,} chars "
+        f"({len(full_prompt) / len(narrowed_prompt):.0f}x smaller)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares SpecFormatter.select_nodes, alone and followed by the prompt's
+serialization, against the original per-ref recursive merge and json.dumps.
+
+    python -m benchmarks.select_nodes
+    python -m benchmarks.select_nodes --spec stripe.json --repeat 3
+"""
+
+import argparse
+import json
+
+from restly.serialization import dumps
+from restly.utils import SpecFormatter
+
+from .synthetic import generate_spec
+from .timing import best_of, report
+
+
+def legacy_select_nodes(spec: dict, refs: set[str]) -> dict:
+    result = {}
+    for ref in refs:
+        path = ref[2:].split("/")
+        node = _legacy_get_node(spec, path)
+        result = _legacy_merge_node(result, node, path)
+    return result
+
+
+def _legacy_merge_node(result: dict, node: dict, path: list[str]) -> dict:
+    if len(path) == 0:
+        return node
+    if path[0] not in result:
+        result[path[0]] = {}
+    result[path[0]] = _legacy_merge_node(result[path[0]], node, path[1:])
+    return result
+
+
+def _legacy_get_node(node: dict, path: list[str]):
+    if len(path) == 0:
+        return node
+    return _legacy_get_node(node[path[0]], path[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spec", help="path to a JSON spec (default: synthetic)")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--schemas", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    else:
+        spec = generate_spec(operations=args.operations, schemas=args.schemas)
+
+    formatter = SpecFormatter(spec)
+    refs = formatter.collect_refs(formatter.trim_paths_only())
+    nodes = {ref: formatter.resolve_ref(ref) for ref in refs}
+    print(f"refs selected: {len(refs)}")
+
+    legacy_time, legacy_tree = best_of(
+        args.repeat, lambda: legacy_select_nodes(spec, refs)
+    )
+    new_time, new_tree = best_of(
+        args.repeat, lambda: SpecFormatter.project_nodes(nodes)
+    )
+    assert legacy_tree == new_tree, "implementations disagree"
+    report("select", legacy_time, new_time)
+
+    legacy_time, legacy_json = best_of(
+        args.repeat, lambda: json.dumps(legacy_select_nodes(spec, refs))
+    )
+    new_time, new_json = best_of(
+        args.repeat, lambda: dumps(SpecFormatter.project_nodes(nodes))
+    )
+    assert json.loads(legacy_json) == json.loads(new_json), "implementations disagree"
+    report("select + serialize", legacy_time, new_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Compares the JSON work done on large specs by the json module and pydantic
+against restly.serialization with orjson and the pre-serialized responses.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --spec stripe.json --repeat 3
+"""
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+from pydantic import BaseModel
+
+from restly import serialization
+from restly.models import compress_content, decompress_content
+from restly.spec_index import build_spec_index
+
+from .synthetic import generate_spec
+from .timing import best_of, report
+
+
+class LegacySpecModel(BaseModel):
+    id: int
+    name: str
+    url: str
+    content: str
+    status: str
+
+
+class LegacyGetSpecResponse(BaseModel):
+    spec: LegacySpecModel
+
+
+class LegacyCreateSpecResponse(BaseModel):
+    id: int
+    name: str
+    status: str
+    spec: Optional[dict] = None
+
+
+def with_stdlib(fn):
+    # The same code with orjson hidden from restly.serialization
+    def run():
+        orjson, serialization.orjson = serialization.orjson, None
+        try:
+            return fn()
+        finally:
+            serialization.orjson = orjson
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spec", help="path to a JSON spec (default: synthetic)")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--schemas", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if serialization.orjson is None:
+        sys.exit("orjson is not installed: restly.serialization uses the json module")
+
+    if args.spec:
+        with open(args.spec, "rb") as f:
+            body = f.read()
+    else:
+        spec = generate_spec(operations=args.operations, schemas=args.schemas)
+        body = json.dumps(spec).encode("utf-8")
+    spec = json.loads(body)
+    raw = json.dumps(spec)
+    print(f"spec size: {len(raw) / 1024**2:.1f} MiB")
+
+    legacy, _ = best_of(args.repeat, lambda: json.loads(body))
+    new, _ = best_of(args.repeat, lambda: serialization.loads(body))
+    report("parse the downloaded spec", legacy, new)
+
+    legacy, _ = best_of(
+        args.repeat,
+        lambda: json.dumps(spec, separators=(",", ":"), ensure_ascii=False),
+    )
+    new, _ = best_of(args.repeat, lambda: serialization.dumps(spec))
+    report("serialize a spec for a prompt", legacy, new)
+
+    build = lambda: build_spec_index(0, spec)
+    legacy, _ = best_of(args.repeat, with_stdlib(build))
+    new, _ = best_of(args.repeat, build)
+    report("build the spec index", legacy, new)
+
+    encoding, data = compress_content(raw)
+
+    def legacy_get_spec():
+        content = decompress_content(encoding, data).decode("utf-8")
+        model = LegacySpecModel(
+            id=1,
+            name="spec",
+            url="https://example.com",
+            content=content,
+            status="ready",
+        )
+        return LegacyGetSpecResponse(spec=model).model_dump_json().encode("utf-8")
+
+    def get_spec():
+        spec = {
+            "id": 1,
+            "name": "spec",
+            "url": "https://example.com",
+            "content": decompress_content(encoding, data).decode("utf-8"),
+            "status": "ready",
+        }
+        return serialization.dumps_bytes({"spec": spec})
+
+    legacy, legacy_body = best_of(args.repeat, legacy_get_spec)
+    new, new_body = best_of(args.repeat, get_spec)
+    assert json.loads(legacy_body) == json.loads(new_body)
+    report("GET /api/v1/specs/<id> body", legacy, new)
+
+    # The spec alone, as stored
+    new, _ = best_of(args.repeat, lambda: decompress_content(encoding, data))
+    report("GET /api/v1/specs/<id>/content body", legacy, new)
+
+    def legacy_create_spec():
+        response = LegacyCreateSpecResponse(
+            id=1, name="spec", status="ready", spec=spec
+        )
+        return response.model_dump_json().encode("utf-8")
+
+    def create_spec():
+        head = serialization.dumps_bytes({"id": 1, "name": "spec", "status": "ready"})
+        return b"".join([head[:-1], b',"spec":', raw.encode("utf-8"), head[-1:]])
+
+    legacy, legacy_body = best_of(args.repeat, legacy_create_spec)
+    new, new_body = best_of(args.repeat, create_spec)
+    assert json.loads(legacy_body) == json.loads(new_body)
+    report("POST /api/v1/specs body", legacy, new)
+
+
+if __name__ == "__main__":
+    main()
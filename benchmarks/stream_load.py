@@ -0,0 +1,236 @@
+"""
+Load test for streamed tutorial generation. Runs the app under gunicorn against
+the fake LLM server, opens many generate-content streams at once and reports
+how many were served concurrently, time to first byte and stream durations,
+once per worker class.
+
+    python -m benchmarks.stream_load
+    python -m benchmarks.stream_load --streams 2000 --workers 2 --worker-class gevent
+    python -m benchmarks.stream_load --tokens 100 --tokens-per-second 10
+
+The database defaults to a temporary SQLite file; any --database-url given is
+assumed to be a scratch database and its tables are dropped.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .fake_llm import FakeLLM, serve_fake_llm
+from .http_server import Fixture, serve_fixtures
+from .synthetic import generate_spec
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--worker-class", nargs="+", default=["sync", "gevent"], dest="worker_classes"
+    )
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=25.0)
+    parser.add_argument(
+        "--deadline", type=float, default=60.0, help="Seconds before giving up"
+    )
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+    # The app configures INFO logging, which would log every client request
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _, llm_url = serve_fake_llm(
+        FakeLLM(tokens=args.tokens, tokens_per_second=args.tokens_per_second)
+    )
+    spec = json.dumps(generate_spec(operations=20, schemas=20)).encode()
+    fixture_server, fixture_url = serve_fixtures(
+        {"/spec.json": Fixture(spec, {"Content-Type": "application/json"})}
+    )
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url
+        or f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite",
+        "OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_KEY": "fake",
+        "FLASK_DEBUG": "",
+        "SQLALCHEMY_ECHO": "0",
+    }
+    token, spec_id, tutorial_ids = seed(env, f"{fixture_url}/spec.json", args.streams)
+    print(
+        f"{args.streams} streams of {args.tokens} tokens at "
+        f"{args.tokens_per_second:g} tokens/s, {args.workers} workers"
+    )
+
+    try:
+        for worker_class in args.worker_classes:
+            port = _free_port()
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    "-c",
+                    "gunicorn.conf.py",
+                    "--bind",
+                    f"127.0.0.1:{port}",
+                    "--workers",
+                    str(args.workers),
+                    "--worker-class",
+                    worker_class,
+                    "--log-level",
+                    "warning",
+                    "app:app",
+                ],
+                cwd=ROOT,
+                env=env,
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                _wait_until_up(base_url)
+                results = asyncio.run(
+                    load(base_url, token, spec_id, tutorial_ids, args.deadline)
+                )
+                report(worker_class, results)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        fixture_server.shutdown()
+
+
+def seed(env: dict, spec_url: str, tutorials: int) -> tuple[str, int, list[int]]:
+    # Set before importing the app, whose config reads them at import time
+    os.environ.update(env)
+    from restly.app import create_app
+    from restly.db import db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    client = app.test_client()
+
+    token = client.post("/api/v1/users", json={"email": None}).json["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/api/v1/specs", json={"url": spec_url}, headers=headers)
+    spec_id = response.json["id"]
+    tutorial_ids = [
+        client.post(
+            "/api/v1/tutorials", json={"name": f"Tutorial {i}"}, headers=headers
+        ).json["id"]
+        for i in range(tutorials)
+    ]
+    return token, spec_id, tutorial_ids
+
+
+async def load(
+    base_url: str, token: str, spec_id: int, tutorial_ids: list[int], deadline: float
+) -> list[dict]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=deadline
+    ) as client:
+        start = time.monotonic()
+        return await asyncio.gather(
+            *(
+                _stream(client, token, spec_id, tutorial_id, start)
+                for tutorial_id in tutorial_ids
+            )
+        )
+
+
+async def _stream(
+    client: httpx.AsyncClient, token: str, spec_id: int, tutorial_id: int, start: float
+) -> dict:
+    body = {
+        "specId": spec_id,
+        "query": "How do I list resources?",
+        "apis": [{"path": "/resource0", "verb": "get"}],
+        "server": "https://api.example.com",
+    }
+    result = {"ok": False, "first_byte": None, "end": None, "reads": 0}
+    try:
+        async with client.stream(
+            "POST",
+            f"/api/v1/tutorials/{tutorial_id}/generate-content",
+            json=body,
+            headers={"Authorization": f"Bearer {token}"},
+        ) as response:
+            async for _ in response.aiter_raw():
+                result["reads"] += 1
+                if result["first_byte"] is None:
+                    result["first_byte"] = time.monotonic() - start
+            result["ok"] = response.status_code == 200
+    except httpx.HTTPError:
+        pass
+    result["end"] = time.monotonic() - start
+    return result
+
+
+def report(worker_class: str, results: list[dict]):
+    completed = [result for result in results if result["ok"]]
+    print(f"\n{worker_class}:")
+    print(f"  completed:        {len(completed)}/{len(results)}")
+    if not completed:
+        return
+
+    # Streams are open from their first byte until they end
+    events = sorted(
+        [(result["first_byte"], 1) for result in completed]
+        + [(result["end"], -1) for result in completed]
+    )
+    open_streams = peak = 0
+    for _, delta in events:
+        open_streams += delta
+        peak = max(peak, open_streams)
+
+    first_bytes = [result["first_byte"] for result in completed]
+    ends = [result["end"] for result in completed]
+    print(f"  peak open:        {peak}")
+    print(f"  first byte p50:   {_percentile(first_bytes, 50):8.2f} s")
+    print(f"  first byte p95:   {_percentile(first_bytes, 95):8.2f} s")
+    print(f"  completion p50:   {_percentile(ends, 50):8.2f} s")
+    print(f"  completion p95:   {_percentile(ends, 95):8.2f} s")
+    print(f"  wall time:        {max(ends):8.2f} s")
+    reads = statistics.mean(result["reads"] for result in completed)
+    print(f"  reads per stream: {reads:8.1f}")
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(base_url)
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Regression suite: times SpecFormatter stages and tutorial prompt assembly on
+synthetic specs of increasing size, with their peak memory, then runs the main
+endpoints end to end against SQLite and the fake LLM provider. Results can be
+written as JSON and compared against an earlier run.
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output current.json --compare baseline.json
+    python -m benchmarks.suite --sizes 1000,10000,50000 --repeat 3
+
+With --compare, the exit status is 1 when any benchmark got slower than
+--threshold times its baseline.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .http_server import Fixture, serve_fixtures
+from .synthetic import generate_spec
+from .timing import best_of, peak_memory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The model whose tokenizer prompt assembly counts with
+MODEL = "gpt-4-1106-preview"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,50000",
+        help="Comma-separated operation counts of the synthetic specs",
+    )
+    parser.add_argument(
+        "--schemas-per-operation", type=float, default=0.5, dest="schema_ratio"
+    )
+    parser.add_argument("--apis", type=int, default=10, help="Selected per tutorial")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--requests", type=int, default=20, help="Per endpoint and spec size"
+    )
+    parser.add_argument(
+        "--endpoint-max-operations",
+        type=int,
+        default=10000,
+        help="Larger specs only get the SpecFormatter benchmarks",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    # Set before importing the app, whose config reads them at import time
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite",
+            "SQLALCHEMY_ECHO": "0",
+            "LLM_PROVIDER": "fake",
+            "LLM_MODEL": MODEL,
+            "LLM_FAKE_LATENCY": "0",
+            "LLM_FAKE_TOKENS": "200",
+            "LLM_FAKE_TOKENS_PER_SECOND": "1000000",
+            # Every request should pay for its completion
+            "LLM_CACHE_ENABLED": "0",
+        }
+    )
+    logging.disable(logging.WARNING)
+
+    results = []
+    for operations in sizes:
+        schemas = max(100, int(operations * args.schema_ratio))
+        spec = generate_spec(operations=operations, schemas=schemas, seed=args.seed)
+        print(f"\n{operations} operations, {schemas} schemas:")
+        results.extend(formatter_benchmarks(spec, operations, args))
+        if operations <= args.endpoint_max_operations:
+            results.extend(endpoint_benchmarks(spec, operations, args))
+
+    document = {"environment": environment(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(baseline["results"], results, args.threshold):
+            sys.exit(1)
+
+
+def formatter_benchmarks(spec: dict, operations: int, args) -> list[dict]:
+    from restly.prompt_builder import build_spec_prompt
+    from restly.prompts import GENERATE_TUTORIAL_PROMPT
+    from restly.types import ApiEndpoint
+    from restly.utils import HTTP_METHODS, SpecFormatter
+
+    rng = random.Random(args.seed)
+    endpoints = [
+        ApiEndpoint(path=path, verb=verb.upper())
+        for path, path_item in spec["paths"].items()
+        for verb in path_item
+        if verb in HTTP_METHODS
+    ]
+    apis = rng.sample(endpoints, min(args.apis, len(endpoints)))
+    narrowed = SpecFormatter(spec).narrow_api_list(apis)
+    refs = SpecFormatter(spec).collect_refs(narrowed)
+
+    def generate_content_prompt():
+        # What generate-content assembled before the spec index existed
+        formatter = SpecFormatter(spec)
+        trimmed_spec = formatter.narrow_api_list(apis)
+        ref_tree = formatter.select_nodes(formatter.collect_refs(trimmed_spec))
+        final_spec = {**trimmed_spec, **ref_tree, **formatter.extract_security_info()}
+        return build_spec_prompt(
+            GENERATE_TUTORIAL_PROMPT,
+            final_spec,
+            max_tokens=10**9,
+            model=MODEL,
+            query="How do I update a resource?",
+            server="https://api.example.com",
+        )
+
+    # A new formatter per run, since it memoizes refs
+    stages = {
+        "trim_paths_only": lambda: SpecFormatter(spec).trim_paths_only(),
+        "narrow_api_list": lambda: SpecFormatter(spec).narrow_api_list(apis),
+        "collect_refs": lambda: SpecFormatter(spec).collect_refs(narrowed),
+        "collect_refs (all paths)": lambda: SpecFormatter(spec).collect_refs(
+            SpecFormatter(spec).trim_paths_only()
+        ),
+        "select_nodes": lambda: SpecFormatter(spec).select_nodes(refs),
+        "extract_security_info": lambda: SpecFormatter(spec).extract_security_info(),
+        "generate_content prompt": generate_content_prompt,
+    }
+
+    results = []
+    for name, fn in stages.items():
+        seconds, _ = best_of(args.repeat, fn)
+        peak, _ = peak_memory(fn)
+        results.append(
+            {
+                "benchmark": f"formatter/{name}",
+                "operations": operations,
+                "seconds": seconds,
+                "peak_bytes": peak,
+            }
+        )
+        print(f"  {name:<28}{seconds * 1000:>10.2f} ms{peak / 1024**2:>10.1f} MiB")
+    return results
+
+
+def endpoint_benchmarks(spec: dict, operations: int, args) -> list[dict]:
+    from restly.app import create_app
+    from restly.db import db
+    from restly.spec_index import spec_cache
+    from restly.utils import HTTP_METHODS
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    client = app.test_client()
+
+    fixture_server, fixture_url = serve_fixtures(
+        {
+            "/spec.json": Fixture(
+                json.dumps(spec).encode(), {"Content-Type": "application/json"}
+            )
+        }
+    )
+    try:
+        token = client.post("/api/v1/users", json={"email": None}).json["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        def post(url, body):
+            response = client.post(url, json=body, headers=headers)
+            assert response.status_code == 200, (url, response.status_code)
+            return response
+
+        start = time.perf_counter()
+        spec_id = post("/api/v1/specs", {"url": f"{fixture_url}/spec.json"}).json["id"]
+        ingest_seconds = time.perf_counter() - start
+
+        rng = random.Random(args.seed)
+        endpoints = [
+            {"path": path, "verb": verb.upper()}
+            for path, path_item in spec["paths"].items()
+            for verb in path_item
+            if verb in HTTP_METHODS
+        ]
+        tutorial_id = post("/api/v1/tutorials", {"name": "Benchmark"}).json["id"]
+
+        def generate_content():
+            body = {
+                "specId": spec_id,
+                "query": "How do I update a resource?",
+                "apis": rng.sample(endpoints, min(args.apis, len(endpoints))),
+                "server": "https://api.example.com",
+            }
+            response = post(f"/api/v1/tutorials/{tutorial_id}/generate-content", body)
+            # Streamed: the generation is over once the body is read
+            response.get_data()
+
+        requests = {
+            "get spec": lambda: client.get(
+                f"/api/v1/specs/{spec_id}", headers=headers
+            ).get_data(),
+            "get spec content": lambda: client.get(
+                f"/api/v1/specs/{spec_id}/content", headers=headers
+            ).get_data(),
+            "relevant-apis": lambda: post(
+                f"/api/v1/specs/{spec_id}/relevant-apis",
+                {"query": f"update resource {rng.randrange(operations)}"},
+            ),
+            "relevant-apis (local)": lambda: post(
+                f"/api/v1/specs/{spec_id}/relevant-apis",
+                {
+                    "query": f"update resource {rng.randrange(operations)}",
+                    "mode": "local",
+                },
+            ),
+            "generate-content": generate_content,
+        }
+
+        results = [
+            {
+                "benchmark": "endpoint/create spec",
+                "operations": operations,
+                "seconds": ingest_seconds,
+            }
+        ]
+        print(f"  {'POST /api/v1/specs':<28}{ingest_seconds * 1000:>10.2f} ms")
+        for name, request in requests.items():
+            for cache in ("cold", "warm"):
+                latencies = []
+                for _ in range(args.requests):
+                    if cache == "cold":
+                        spec_cache.clear()
+                    start = time.perf_counter()
+                    request()
+                    latencies.append(time.perf_counter() - start)
+                mean = statistics.mean(latencies)
+                p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+                results.append(
+                    {
+                        "benchmark": f"endpoint/{name} ({cache})",
+                        "operations": operations,
+                        "seconds": mean,
+                        "p95_seconds": p95,
+                    }
+                )
+                print(
+                    f"  {f'{name} ({cache})':<28}{mean * 1000:>10.2f} ms"
+                    f"{p95 * 1000:>10.2f} ms p95"
+                )
+        return results
+    finally:
+        fixture_server.shutdown()
+
+
+def compare(baseline: list[dict], results: list[dict], threshold: float) -> bool:
+    """
+    Prints how each benchmark changed against the baseline. Returns False if any
+    got slower than threshold times its baseline.
+    """
+    previous = {(r["benchmark"], r["operations"]): r["seconds"] for r in baseline}
+    ok = True
+    print(f"\ncompared to baseline (regression above {threshold:.2f}x):")
+    for result in results:
+        key = (result["benchmark"], result["operations"])
+        if key not in previous:
+            continue
+        ratio = result["seconds"] / previous[key] if previous[key] else 1.0
+        regressed = ratio > threshold
+        ok = ok and not regressed
+        print(
+            f"  {'REGRESSED' if regressed else 'ok':<10}{ratio:>7.2f}x  "
+            f"{key[0]} ({key[1]} operations)"
+        )
+    return ok
+
+
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "args": vars(args),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import random
+
+
+def generate_spec(
+    operations: int = 1000,
+    schemas: int = 2000,
+    fanout: int = 3,
+    seed: int = 0,
+) -> dict:
+    """
+    Generates a synthetic OpenAPI 3 spec shaped like large real-world specs:
+    many operations, a large components.schemas section and a deep, cyclic
+    $ref graph built from properties, arrays and allOf/oneOf compositions.
+    """
+    rng = random.Random(seed)
+
+    def schema_ref(i: int) -> dict:
+        return {"$ref": f"#/components/schemas/Schema{i}"}
+
+    component_schemas = {}
+    for i in range(schemas):
+        # Mostly point "forward" to build deep chains, sometimes back for cycles
+        targets = [
+            (
+                (i + rng.randint(1, 50)) % schemas
+                if rng.random() < 0.8
+                else rng.randrange(max(i, 1))
+            )
+            for _ in range(fanout)
+        ]
+        schema = {
+            "type": "object",
+            "description": f"Schema number {i}. " * rng.randint(1, 8),
+            "properties": {
+                "id": {"type": "string", "example": f"obj_{i}"},
+                "child": schema_ref(targets[0]),
+                "items": {"type": "array", "items": schema_ref(targets[1])},
+            },
+            "x-generated": True,
+        }
+        if fanout > 2:
+            schema["allOf"] = [schema_ref(target) for target in targets[2:]]
+        if i % 5 == 0:
+            schema["oneOf"] = [schema_ref(rng.randrange(schemas)) for _ in range(2)]
+        component_schemas[f"Schema{i}"] = schema
+
+    verbs = ["get", "post", "put", "patch", "delete"]
+    paths = {}
+    for i in range(operations):
+        path = f"/v1/resource{i // len(verbs)}/{{id}}"
+        verb = verbs[i % len(verbs)]
+        target = rng.randrange(schemas)
+        paths.setdefault(path, {})[verb] = {
+            "summary": f"{verb.upper()} resource {i // len(verbs)}",
+            "description": f"Operates on resource {i}. " * rng.randint(1, 5),
+            "tags": [f"tag{i % 20}"],
+            "parameters": [
+                {"$ref": "#/components/parameters/Id"},
+                {"name": "expand", "in": "query", "schema": {"type": "string"}},
+            ],
+            "requestBody": {
+                "content": {"application/json": {"schema": schema_ref(target)}}
+            },
+            "responses": {
+                "200": {
+                    "description": "OK",
+                    "content": {"application/json": {"schema": schema_ref(target)}},
+                }
+            },
+        }
+    # Path-level fields, which apply to every operation of the path
+    for i, path_item in enumerate(paths.values()):
+        if i % 7 == 0:
+            path_item["summary"] = f"Resource {i}"
+            path_item["description"] = f"Shared by the operations on resource {i}."
+            path_item["parameters"] = [{"$ref": "#/components/parameters/Id"}]
+
+    return {
+        "openapi": "3.0.0",
+        "info": {"title": "Synthetic", "version": "1.0.0"},
+        "security": [{"apiKey": []}],
+        "paths": paths,
+        "components": {
+            "parameters": {"Id": {"name": "id", "in": "path", "required": True}},
+            "schemas": component_schemas,
+            "securitySchemes": {
+                "apiKey": {"type": "apiKey", "in": "header", "name": "X-Api-Key"}
+            },
+        },
+    }
@@ -0,0 +1,36 @@
+import time
+import tracemalloc
+from typing import Any, Callable
+
+
+def best_of(repeat: int, fn: Callable[[], Any]) -> tuple[float, Any]:
+    """
+    Runs fn repeat times and returns the fastest wall time with the last result.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(label: str, legacy_time: float, new_time: float):
+    print(f"{label}:")
+    print(f"  legacy:  {legacy_time * 1000:10.1f} ms")
+    print(f"  current: {new_time * 1000:10.1f} ms ({legacy_time / new_time:.1f}x)")
+
+
+def peak_memory(fn: Callable[[], Any]) -> tuple[int, Any]:
+    """
+    Runs fn once under tracemalloc and returns the peak of the memory it
+    allocated on top of what was already in use, in bytes, with its result.
+    """
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, result
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings. Tutorial generation streams a completion for up to a few
+minutes, so by default each worker process runs gevent greenlets instead of
+handling one request at a time. Every setting can be overridden with the
+GUNICORN_* environment variables below or on the command line.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+# "sync" restores one request per worker
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+# Concurrent requests (mostly open streams) per gevent worker
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 200))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+
+def post_fork(server, worker):
+    if server.cfg.worker_class_str == "gevent":
+        # psycopg2 blocks in C; make it yield to other greenlets instead
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
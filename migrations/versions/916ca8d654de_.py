@@ -0,0 +1,118 @@
+"""store spec content in content-addressed, compressed spec_blob
+
+Revision ID: 916ca8d654de
+Revises: c96007f85aad
+Create Date: 2026-10-18 16:21:43.070513
+
+"""
+import gzip
+
+from alembic import op
+import sqlalchemy as sa
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# revision identifiers, used by Alembic.
+revision = '916ca8d654de'
+down_revision = 'c96007f85aad'
+branch_labels = None
+depends_on = None
+
+
+spec = sa.table(
+    'spec',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.String),
+    sa.column('content_hash', sa.String),
+)
+spec_blob = sa.table(
+    'spec_blob',
+    sa.column('sha256', sa.String),
+    sa.column('encoding', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+)
+
+
+def upgrade():
+    op.create_table('spec_blob',
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('encoding', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.alter_column('content_hash', existing_type=sa.String(), nullable=True)
+
+    # Backfill one row at a time so that large specs are never all in memory.
+    # Blobs are gzipped here; the application reads both gzip and zstd.
+    connection = op.get_bind()
+    stored = set()
+    ids = connection.execute(sa.select(spec.c.id).order_by(spec.c.id)).scalars().all()
+    for spec_id in ids:
+        row = connection.execute(
+            sa.select(spec.c.content, spec.c.content_hash).where(spec.c.id == spec_id)
+        ).one()
+        if not row.content:
+            # Pending background ingestion
+            connection.execute(
+                spec.update().where(spec.c.id == spec_id).values(content_hash=None)
+            )
+            continue
+        if row.content_hash in stored:
+            continue
+        data = row.content.encode('utf-8')
+        connection.execute(
+            spec_blob.insert().values(
+                sha256=row.content_hash,
+                encoding='gzip',
+                size=len(data),
+                data=gzip.compress(data, compresslevel=6),
+            )
+        )
+        stored.add(row.content_hash)
+
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_spec_content_hash_spec_blob', 'spec_blob', ['content_hash'], ['sha256'])
+        batch_op.drop_column('content')
+
+
+def downgrade():
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content', sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(spec_blob.c.sha256).select_from(spec_blob)
+    ).scalars().all()
+    for sha256 in rows:
+        blob = connection.execute(
+            sa.select(spec_blob.c.encoding, spec_blob.c.data).where(spec_blob.c.sha256 == sha256)
+        ).one()
+        if blob.encoding == 'zstd':
+            data = zstandard.ZstdDecompressor().decompress(blob.data)
+        else:
+            data = gzip.decompress(blob.data)
+        connection.execute(
+            spec.update()
+            .where(spec.c.content_hash == sha256)
+            .values(content=data.decode('utf-8'))
+        )
+    connection.execute(
+        spec.update().where(spec.c.content_hash.is_(None)).values(content='', content_hash='')
+    )
+
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_spec_content_hash_spec_blob', type_='foreignkey')
+        batch_op.alter_column('content', existing_type=sa.String(), nullable=False)
+        batch_op.alter_column('content_hash', existing_type=sa.String(), nullable=False)
+
+    op.drop_table('spec_blob')
@@ -0,0 +1,66 @@
+"""store user tokens hashed
+
+Revision ID: be8b741739fb
+Revises: 7bc2b5ebcb21
+Create Date: 2026-10-18 20:02:31.518206
+
+"""
+from hashlib import sha256
+from uuid import uuid4
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be8b741739fb'
+down_revision = '7bc2b5ebcb21'
+branch_labels = None
+depends_on = None
+
+
+user = sa.table(
+    'user',
+    sa.column('id', sa.Integer),
+    sa.column('token', sa.String),
+    sa.column('token_hash', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_hash', sa.String(), nullable=True))
+
+    # Existing tokens keep working: only their hash is kept
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(user.c.id, user.c.token)).all()
+    for row in rows:
+        connection.execute(
+            user.update()
+            .where(user.c.id == row.id)
+            .values(token_hash=sha256(row.token.encode('utf-8')).hexdigest())
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('token_hash', existing_type=sa.String(), nullable=False)
+        batch_op.create_unique_constraint('user_token_hash_key', ['token_hash'])
+        # Drops the unique constraint on token along with it
+        batch_op.drop_column('token')
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=True))
+
+    # Hashed tokens cannot be recovered, so every user gets a new one
+    connection = op.get_bind()
+    ids = connection.execute(sa.select(user.c.id)).scalars().all()
+    for user_id in ids:
+        connection.execute(
+            user.update().where(user.c.id == user_id).values(token=uuid4().hex)
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('token', existing_type=sa.String(), nullable=False)
+        batch_op.create_unique_constraint('user_token_key', ['token'])
+        batch_op.drop_column('token_hash')
@@ -0,0 +1,52 @@
+"""add spec.content_hash
+
+Revision ID: e9b2f288b444
+Revises: 10e36f884512
+Create Date: 2026-10-18 11:40:07.918342
+
+"""
+from hashlib import sha256
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b2f288b444'
+down_revision = '10e36f884512'
+branch_labels = None
+depends_on = None
+
+
+spec = sa.table(
+    'spec',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.String),
+    sa.column('content_hash', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(), nullable=True))
+
+    # Hash one row at a time so that large specs are never all in memory
+    connection = op.get_bind()
+    ids = connection.execute(sa.select(spec.c.id).order_by(spec.c.id)).scalars().all()
+    for spec_id in ids:
+        content = connection.execute(
+            sa.select(spec.c.content).where(spec.c.id == spec_id)
+        ).scalar_one()
+        connection.execute(
+            spec.update()
+            .where(spec.c.id == spec_id)
+            .values(content_hash=sha256(content.encode('utf-8')).hexdigest())
+        )
+
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.alter_column('content_hash', existing_type=sa.String(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('spec', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
@@ -1,13 +1,21 @@
 import os
 
 from flask import Flask
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_migrate import Migrate
 
+from .auth import auth_cache, invalid_token_cache
+from .batches import batch_worker_command
 from .config import DevelopmentConfig, ProductionConfig
-from .db import db
+from .db import configure_engines, db, engine_options
+from .jobs import ingest_worker_command
+from .llm import PROVIDERS
+from .metrics import init_metrics
+from .profiling import init_profiling
 from .routes import routes_bp
 from .models import User, Spec, Tutorial
+from .spec_index import spec_cache
 
 
 def create_app():
@@ -21,9 +29,28 @@ def create_app():
         app.config.from_object(ProductionConfig)
         CORS(app)
 
+    if app.config["LLM_PROVIDER"] not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER: {app.config['LLM_PROVIDER']}")
+
+    spec_cache.configure(max_bytes=app.config["SPEC_CACHE_MAX_BYTES"])
+    auth_cache.configure(
+        max_bytes=app.config["AUTH_CACHE_MAX_BYTES"], ttl=app.config["AUTH_CACHE_TTL"]
+    )
+    invalid_token_cache.configure(
+        max_bytes=app.config["AUTH_NEGATIVE_CACHE_MAX_BYTES"],
+        ttl=app.config["AUTH_NEGATIVE_CACHE_TTL"],
+    )
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
     db.init_app(app)
+    configure_engines(app)
+    init_metrics(app)
+    init_profiling(app)
+    Compress(app)
     migrate = Migrate(app, db)
     migrate.init_app(app, db)
     app.register_blueprint(routes_bp)
+    app.cli.add_command(ingest_worker_command)
+    app.cli.add_command(batch_worker_command)
 
     return app
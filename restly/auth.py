@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from .cache import LRUCache
+from .db import db
+from .models import User, hash_token
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """
+    Identity of the user making a request. Kept instead of the User row so it
+    can be cached across requests and sessions.
+    """
+
+    id: int
+    email: Optional[str]
+
+
+# token hash -> AuthenticatedUser. Budgets and TTLs are set in create_app.
+# Caches are per process, so a rotated token stays valid in other processes
+# until its entry expires.
+auth_cache = LRUCache(max_bytes=0)
+# Token hashes known to be invalid, kept apart so that a flood of bad tokens
+# cannot evict valid identities
+invalid_token_cache = LRUCache(max_bytes=0)
+
+# Approximate size of a cache entry, to avoid measuring each one
+AUTH_CACHE_ENTRY_SIZE = 512
+
+
+def authenticate(token: str) -> Optional[AuthenticatedUser]:
+    token_hash = hash_token(token)
+
+    identity = auth_cache.get(token_hash)
+    if identity is not None:
+        return identity
+    if invalid_token_cache.get(token_hash) is not None:
+        return None
+
+    row = db.session.execute(
+        select(User.id, User.email).where(User.token_hash == token_hash)
+    ).first()
+    if row is None:
+        invalid_token_cache.set(token_hash, True, size=AUTH_CACHE_ENTRY_SIZE)
+        return None
+
+    identity = AuthenticatedUser(id=row.id, email=row.email)
+    auth_cache.set(token_hash, identity, size=AUTH_CACHE_ENTRY_SIZE)
+    return identity
+
+
+def invalidate_token(token_hash: str):
+    """
+    Forgets a token in this process, e.g. after it was rotated.
+    """
+    auth_cache.delete(token_hash)
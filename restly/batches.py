@@ -0,0 +1,370 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, func, or_, select, update
+
+from .db import db
+from .generations import create_generation, produce_generation
+from .llm import llm_provider
+from .metrics import observe_prompt
+from .models import (
+    BATCH_ITEM_STATUS_FAILED,
+    BATCH_ITEM_STATUS_QUEUED,
+    BATCH_ITEM_STATUS_STARTED,
+    GENERATION_STATUS_FAILED,
+    GENERATION_STATUS_RUNNING,
+    Generation,
+    Spec,
+    Tutorial,
+    TutorialBatch,
+    TutorialBatchItem,
+)
+from .prompt_builder import build_spec_prompt, count_tokens
+from .prompts import GENERATE_TUTORIAL_BATCH_ITEM, GENERATE_TUTORIAL_BATCH_PREFIX
+from .spec_index import spec_slice
+from .types import ApiEndpoint, ApiEndpointList
+
+logger = logging.getLogger(__name__)
+
+
+class BatchLimitError(Exception):
+    """
+    Raised when a user already has too many tutorials queued or running. The
+    message is safe to return to the client.
+    """
+
+
+def submit_batch(
+    user_id: int,
+    spec: Spec,
+    server: str,
+    items: list[tuple[str, str, list[ApiEndpoint]]],
+    bypass_cache: bool = False,
+) -> TutorialBatch:
+    """
+    Creates a tutorial for each (name, query, apis) item and queues their
+    generation. The spec slice of the prompt is built once, for the APIs of
+    all the items. Commits the session.
+
+    Raises BatchLimitError when the user would have more than
+    BATCH_USER_MAX_PENDING tutorials pending, and PromptTooLargeError when the
+    prompt does not fit TUTORIAL_PROMPT_MAX_TOKENS.
+    """
+    config = current_app.config
+    pending = pending_items(user_id)
+    if pending + len(items) > config["BATCH_USER_MAX_PENDING"]:
+        raise BatchLimitError(
+            f"{pending} tutorials are already pending, at most "
+            f"{config['BATCH_USER_MAX_PENDING']} can be; wait for them to finish"
+        )
+
+    model = llm_provider().model
+    # The prefix gets whatever budget the longest item leaves
+    suffix_tokens = max(
+        count_tokens(item_prompt("", query, apis, server), model)
+        for _, query, apis in items
+    )
+    apis = [api for _, _, item_apis in items for api in item_apis]
+    prefix = build_spec_prompt(
+        GENERATE_TUTORIAL_BATCH_PREFIX,
+        spec_slice(spec, apis),
+        max_tokens=config["TUTORIAL_PROMPT_MAX_TOKENS"] - suffix_tokens,
+        model=model,
+    )
+    observe_prompt("tutorial_batch_prefix", prefix.prompt, prefix.tokens)
+    logger.info(
+        "Tutorial batch prompt prefix: %s tokens, reduced by %s",
+        prefix.tokens,
+        ", ".join(prefix.reductions) or "nothing",
+    )
+
+    batch = TutorialBatch(
+        user_id=user_id,
+        spec_id=spec.id,
+        server=server,
+        prompt_prefix=prefix.prompt,
+        bypass_cache=bypass_cache,
+    )
+    tutorials = [Tutorial(name=name, user_id=user_id) for name, _, _ in items]
+    db.session.add(batch)
+    db.session.add_all(tutorials)
+    db.session.flush()
+    db.session.add_all(
+        TutorialBatchItem(
+            batch_id=batch.id,
+            user_id=user_id,
+            tutorial_id=tutorial.id,
+            input=query,
+            relevant_apis=ApiEndpointList(apis=item_apis).model_dump_json(),
+        )
+        for tutorial, (_, query, item_apis) in zip(tutorials, items)
+    )
+    db.session.commit()
+    return batch
+
+
+def item_prompt(prefix: str, query: str, apis: list[ApiEndpoint], server: str) -> str:
+    listed = "\n".join(f"{api.verb.upper()} {api.path}" for api in apis)
+    return prefix + GENERATE_TUTORIAL_BATCH_ITEM.format(
+        query=query, apis=listed, server=server
+    )
+
+
+def pending_items(user_id: int) -> int:
+    """
+    Number of the user's batch items that are queued or being generated.
+    """
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config["GENERATION_STALE_AFTER"]
+    )
+    return db.session.scalar(
+        select(func.count())
+        .select_from(TutorialBatchItem)
+        .outerjoin(Generation, Generation.id == TutorialBatchItem.generation_id)
+        .where(
+            TutorialBatchItem.user_id == user_id,
+            or_(
+                TutorialBatchItem.status == BATCH_ITEM_STATUS_QUEUED,
+                and_(
+                    Generation.status == GENERATION_STATUS_RUNNING,
+                    Generation.heartbeat_at >= stale_before,
+                ),
+            ),
+        )
+    )
+
+
+def batch_progress(batch_id: int) -> list[dict]:
+    """
+    Status of each item of a batch, in submission order: queued, running, done
+    or failed, with its generation (which can be followed from
+    /api/v1/generations/<id>/events) once started.
+    """
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config["GENERATION_STALE_AFTER"]
+    )
+    rows = db.session.execute(
+        select(
+            TutorialBatchItem.tutorial_id,
+            Tutorial.name,
+            TutorialBatchItem.status,
+            TutorialBatchItem.error,
+            TutorialBatchItem.generation_id,
+            Generation.status.label("generation_status"),
+            Generation.error.label("generation_error"),
+            Generation.chunk_count,
+            Generation.heartbeat_at,
+        )
+        .join(Tutorial, Tutorial.id == TutorialBatchItem.tutorial_id)
+        .outerjoin(Generation, Generation.id == TutorialBatchItem.generation_id)
+        .where(TutorialBatchItem.batch_id == batch_id)
+        .order_by(TutorialBatchItem.id)
+    )
+
+    progress = []
+    for row in rows:
+        if row.status == BATCH_ITEM_STATUS_STARTED:
+            status, error = row.generation_status, row.generation_error
+            if status == GENERATION_STATUS_RUNNING and row.heartbeat_at < stale_before:
+                status, error = GENERATION_STATUS_FAILED, "Generation was interrupted"
+        else:
+            status, error = row.status, row.error
+        progress.append(
+            {
+                "tutorial_id": row.tutorial_id,
+                "name": row.name,
+                "status": status,
+                "generation_id": row.generation_id,
+                "chunk_count": row.chunk_count or 0,
+                "error": error,
+            }
+        )
+    return progress
+
+
+def claim_next_item(
+    max_per_user: int, stale_after: timedelta
+) -> Optional[TutorialBatchItem]:
+    """
+    Atomically claims the oldest queued item of a user with fewer than
+    max_per_user items being generated, marking it started. The claim is
+    committed by run_item along with the item's generation. Concurrent workers
+    can race past the limit by an item or so.
+    """
+    stale_before = datetime.utcnow() - stale_after
+    busy_users = (
+        select(TutorialBatchItem.user_id)
+        .join(Generation, Generation.id == TutorialBatchItem.generation_id)
+        .where(
+            Generation.status == GENERATION_STATUS_RUNNING,
+            Generation.heartbeat_at >= stale_before,
+        )
+        .group_by(TutorialBatchItem.user_id)
+        .having(func.count() >= max_per_user)
+    )
+    item = (
+        TutorialBatchItem.query.filter(
+            TutorialBatchItem.status == BATCH_ITEM_STATUS_QUEUED,
+            TutorialBatchItem.user_id.not_in(busy_users),
+        )
+        .order_by(TutorialBatchItem.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if item is None:
+        db.session.rollback()
+        return None
+
+    # Row locks are not available everywhere (SQLite): only one worker gets to
+    # move the item out of the queue
+    claimed = db.session.execute(
+        update(TutorialBatchItem)
+        .where(
+            TutorialBatchItem.id == item.id,
+            TutorialBatchItem.status == BATCH_ITEM_STATUS_QUEUED,
+        )
+        .values(status=BATCH_ITEM_STATUS_STARTED)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+    return item
+
+
+def run_item(item: TutorialBatchItem):
+    """
+    Starts the generation of a claimed item and produces it in the calling
+    thread.
+    """
+    batch = db.session.get(TutorialBatch, item.batch_id)
+    tutorial = db.session.get(Tutorial, item.tutorial_id)
+    apis = ApiEndpointList.model_validate_json(item.relevant_apis).apis
+    prompt = item_prompt(batch.prompt_prefix, item.input, apis, batch.server)
+
+    # Recorded in the transaction that claimed the item, so that a started
+    # item always has a generation to report its progress
+    generation = create_generation(
+        tutorial, batch.spec_id, item.input, item.relevant_apis, batch.server
+    )
+    item.generation_id = generation.id
+    generation_id, bypass_cache = generation.id, batch.bypass_cache
+    db.session.commit()
+
+    logger.info("Generating batch %s item %s", item.batch_id, item.id)
+    produce_generation(generation_id, prompt, bypass_cache)
+
+
+class BatchWorkerPool:
+    """
+    Threads that claim queued batch items and generate them one at a time, each
+    within its own app context. Several pools (processes) can share one
+    database; LLM_MAX_CONCURRENCY still applies to all generations of a process.
+    """
+
+    def __init__(self, app: Flask, threads: int):
+        self._app = app
+        self._threads = [
+            threading.Thread(target=self._run, name=f"batch-worker-{i}", daemon=True)
+            for i in range(threads)
+        ]
+        self._stopping = False
+        self._wakeup = threading.Condition()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def notify(self):
+        """
+        Wakes up idle workers, e.g. after queueing items, instead of waiting for
+        their next poll.
+        """
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _run(self):
+        config = self._app.config
+        stale_after = timedelta(seconds=config["GENERATION_STALE_AFTER"])
+        while not self._stopping:
+            with self._app.app_context():
+                try:
+                    item = claim_next_item(
+                        config["BATCH_USER_CONCURRENCY"], stale_after
+                    )
+                    if item is not None:
+                        self._run_item(item)
+                        continue
+                except Exception:
+                    logger.exception("Batch worker error")
+                    db.session.rollback()
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(config["BATCH_POLL_INTERVAL"])
+
+    def _run_item(self, item: TutorialBatchItem):
+        item_id = item.id
+        try:
+            run_item(item)
+        except Exception:
+            # Failures of the generation itself are recorded by it
+            logger.exception("Batch item %s failed", item_id)
+            db.session.rollback()
+            item = db.session.get(TutorialBatchItem, item_id)
+            # Still queued unless the generation was committed
+            if item.status == BATCH_ITEM_STATUS_QUEUED:
+                item.status = BATCH_ITEM_STATUS_FAILED
+                item.error = "Internal error while starting generation"
+                db.session.commit()
+
+
+_pool: Optional[BatchWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def batch_worker_pool() -> Optional[BatchWorkerPool]:
+    """
+    Process-wide pool of BATCH_WORKERS threads, started on first use (i.e.
+    after gunicorn has forked the worker), or None when batches are left to
+    `flask batch-worker`.
+    """
+    global _pool
+    threads = current_app.config["BATCH_WORKERS"]
+    if threads <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = BatchWorkerPool(current_app._get_current_object(), threads)
+                pool.start()
+                _pool = pool
+    return _pool
+
+
+@click.command("batch-worker")
+@click.option("--threads", default=8, show_default=True, help="Concurrent items.")
+@with_appcontext
+def batch_worker_command(threads: int):
+    """Generate queued tutorial batch items until interrupted."""
+    pool = BatchWorkerPool(current_app._get_current_object(), threads)
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
+        pool.join()
@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the approximate size of its values in bytes
+    rather than by entry count, so a handful of huge specs cannot push out
+    everything else unnoticed. Entries optionally expire after ttl seconds.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        # key -> (value, size, expiry on the monotonic clock or None)
+        self._entries: OrderedDict[Hashable, tuple[Any, int, Optional[float]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, max_bytes: int, ttl: Optional[float] = None):
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._ttl = ttl
+            self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and _expired(entry):
+                self._size -= self._entries.pop(key)[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        if size is None:
+            size = approximate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            if size > self._max_bytes:
+                return
+            expires_at = None if self._ttl is None else time.monotonic() + self._ttl
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            self._evict()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for key, computing and storing it on a miss.
+        Concurrent misses for the same key may compute it more than once.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        while self._size > self._max_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+
+
+def _expired(entry: tuple[Any, int, Optional[float]]) -> bool:
+    expires_at = entry[2]
+    return expires_at is not None and expires_at <= time.monotonic()
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Approximates the memory held by a JSON-like value. Shared sub-objects are
+    counted once.
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
@@ -1,23 +1,134 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True
+    # Logs every statement; use DB_SLOW_QUERY_MS outside development
+    SQLALCHEMY_ECHO = env_flag("SQLALCHEMY_ECHO", False)
+    # Connection pool, per process (Postgres only, see restly.db.engine_options)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+    # Recycle connections before servers or load balancers drop idle ones
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", True)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+    # Connecting through PgBouncer in transaction mode: no client-side pool,
+    # and the statement timeout is set per transaction
+    DB_PGBOUNCER = env_flag("DB_PGBOUNCER", False)
+    # Log statements slower than this many milliseconds; 0 disables
+    DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 500))
+    # Memory budget for parsed specs and SpecFormatter results, per process
+    SPEC_CACHE_MAX_BYTES = int(os.environ.get("SPEC_CACHE_MAX_BYTES", 256 * 1024**2))
+    # Limits for downloading specs; the size applies after decompression
+    SPEC_MAX_BYTES = int(os.environ.get("SPEC_MAX_BYTES", 64 * 1024**2))
+    SPEC_FETCH_CONNECT_TIMEOUT = float(os.environ.get("SPEC_FETCH_CONNECT_TIMEOUT", 5))
+    SPEC_FETCH_READ_TIMEOUT = float(os.environ.get("SPEC_FETCH_READ_TIMEOUT", 30))
+    SPEC_FETCH_TOTAL_TIMEOUT = float(os.environ.get("SPEC_FETCH_TOTAL_TIMEOUT", 120))
+    # Background ingestion (flask ingest-worker)
+    SPEC_INGEST_MAX_ATTEMPTS = int(os.environ.get("SPEC_INGEST_MAX_ATTEMPTS", 3))
+    SPEC_INGEST_POLL_INTERVAL = float(os.environ.get("SPEC_INGEST_POLL_INTERVAL", 2))
+    # Running jobs not updated for this long are assumed dead and reclaimed
+    SPEC_INGEST_STALE_AFTER = float(os.environ.get("SPEC_INGEST_STALE_AFTER", 600))
+    # Token -> user cache, per process. Rotated tokens keep working in other
+    # processes for up to AUTH_CACHE_TTL seconds
+    AUTH_CACHE_MAX_BYTES = int(os.environ.get("AUTH_CACHE_MAX_BYTES", 8 * 1024**2))
+    AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 60))
+    AUTH_NEGATIVE_CACHE_MAX_BYTES = int(
+        os.environ.get("AUTH_NEGATIVE_CACHE_MAX_BYTES", 2 * 1024**2)
+    )
+    AUTH_NEGATIVE_CACHE_TTL = float(os.environ.get("AUTH_NEGATIVE_CACHE_TTL", 10))
+    # Language model backend: "openai", or "fake" for offline testing
+    LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai")
+    LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4-1106-preview")
+    # Seconds to wait for a response, or between streamed chunks
+    LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+    LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+    # Transient failures (connection errors, 429s, 5xx) are retried after
+    # LLM_RETRY_BACKOFF, 2 * LLM_RETRY_BACKOFF, ... seconds, with jitter
+    LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+    LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", 1))
+    # Concurrent requests per process, including open streams. Requests wait up
+    # to LLM_QUEUE_TIMEOUT seconds for a slot before failing with 503
+    LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 1000))
+    LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 10))
+    # Fake provider: canned completion, and streams of numbered tokens
+    LLM_FAKE_COMPLETION = os.environ.get("LLM_FAKE_COMPLETION", '{"apis": []}')
+    LLM_FAKE_TOKENS = int(os.environ.get("LLM_FAKE_TOKENS", 200))
+    LLM_FAKE_TOKENS_PER_SECOND = float(os.environ.get("LLM_FAKE_TOKENS_PER_SECOND", 50))
+    LLM_FAKE_LATENCY = float(os.environ.get("LLM_FAKE_LATENCY", 0.2))
+    # Operations whose keyword (BM25) score is among the best this many are
+    # offered to the model for relevant-apis; 0 sends the whole spec
+    RELEVANT_APIS_CANDIDATES = int(os.environ.get("RELEVANT_APIS_CANDIDATES", 50))
+    # Completions are cached in the llm_response table, keyed by their prompt.
+    # Requests can skip the lookup with bypassCache to get a fresh completion
+    LLM_CACHE_ENABLED = env_flag("LLM_CACHE_ENABLED", True)
+    LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+    LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024**2))
+    # Tutorial prompts are cut down (extensions, examples, then descriptions)
+    # to fit this many tokens. Counted with tiktoken, whose encodings are
+    # downloaded on first use unless cached in TIKTOKEN_CACHE_DIR
+    TUTORIAL_PROMPT_MAX_TOKENS = int(
+        os.environ.get("TUTORIAL_PROMPT_MAX_TOKENS", 100_000)
+    )
+    # Tutorial generation: streamed tokens are sent in chunks of at least this
+    # many characters, or after this many seconds
+    STREAM_COALESCE_MIN_CHARS = int(os.environ.get("STREAM_COALESCE_MIN_CHARS", 256))
+    STREAM_COALESCE_MAX_DELAY = float(os.environ.get("STREAM_COALESCE_MAX_DELAY", 0.1))
+    # Generations log their chunks to the database this often, which is also
+    # how far behind viewers in other processes can be
+    GENERATION_FLUSH_INTERVAL = float(os.environ.get("GENERATION_FLUSH_INTERVAL", 1))
+    GENERATION_POLL_INTERVAL = float(os.environ.get("GENERATION_POLL_INTERVAL", 0.5))
+    # Running generations not flushed for this long lost their worker
+    GENERATION_STALE_AFTER = float(os.environ.get("GENERATION_STALE_AFTER", 120))
+    SSE_KEEPALIVE_INTERVAL = float(os.environ.get("SSE_KEEPALIVE_INTERVAL", 15))
+    # Tutorial batches are generated by BATCH_WORKERS threads per process (0
+    # leaves them to `flask batch-worker`), at most BATCH_USER_CONCURRENCY
+    # items at a time per user
+    BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 8))
+    BATCH_USER_CONCURRENCY = int(os.environ.get("BATCH_USER_CONCURRENCY", 2))
+    BATCH_POLL_INTERVAL = float(os.environ.get("BATCH_POLL_INTERVAL", 2))
+    BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 100))
+    # Queued and running batch items per user; more are refused with 429
+    BATCH_USER_MAX_PENDING = int(os.environ.get("BATCH_USER_MAX_PENDING", 200))
+    # Requests sent with an X-Profile header equal to PROFILE_TOKEN are profiled
+    # with cProfile, and the stats written to PROFILE_DIR. Unset disables it
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+    PROFILE_DIR = os.environ.get(
+        "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "restly-profiles")
+    )
+    # Response compression (Flask-Compress). Streamed responses are left alone
+    # so that tutorial chunks reach the client as they are generated
+    COMPRESS_MIMETYPES = ["application/json"]
+    COMPRESS_ALGORITHM = ["br", "gzip"]
+    COMPRESS_BR_LEVEL = int(os.environ.get("COMPRESS_BR_LEVEL", 4))
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+    COMPRESS_STREAMS = False
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = True
+    SQLALCHEMY_ECHO = env_flag("SQLALCHEMY_ECHO", True)
 
 
 class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
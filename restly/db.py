@@ -1,6 +1,19 @@
+import logging
+import time
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
+
+from .metrics import DB_QUERY_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Logged statements are cut to this length; spec inserts can be megabytes
+SLOW_QUERY_LOG_MAX_CHARS = 1000
 
 
 class Base(DeclarativeBase):
@@ -8,3 +21,82 @@ class Base(DeclarativeBase):
 
 
 db = SQLAlchemy(model_class=Base)
+
+
+def engine_options(config) -> dict:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured database. Pool settings only
+    apply to Postgres; SQLite keeps SQLAlchemy's defaults.
+    """
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+    if not uri or make_url(uri).get_backend_name() != "postgresql":
+        return {}
+
+    if config["DB_PGBOUNCER"]:
+        # PgBouncer does the pooling, and in transaction mode rejects the
+        # startup options used for the statement timeout below
+        return {"poolclass": NullPool}
+
+    options = {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if config["DB_STATEMENT_TIMEOUT_MS"]:
+        timeout = int(config["DB_STATEMENT_TIMEOUT_MS"])
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def configure_engines(app: Flask):
+    """
+    Installs the per-connection hooks that engine options cannot express. Must
+    run after db.init_app.
+    """
+    config = app.config
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if (
+            config["DB_PGBOUNCER"]
+            and config["DB_STATEMENT_TIMEOUT_MS"]
+            and engine.dialect.name == "postgresql"
+        ):
+            _set_local_statement_timeout(engine, int(config["DB_STATEMENT_TIMEOUT_MS"]))
+        _time_queries(engine, config["DB_SLOW_QUERY_MS"] / 1000)
+
+
+def _set_local_statement_timeout(engine: Engine, timeout: int):
+    # Scoped to the transaction, so it never leaks to other PgBouncer clients
+    @event.listens_for(engine, "begin")
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout}")
+
+
+def _time_queries(engine: Engine, slow_threshold: float):
+    # Statements slower than slow_threshold seconds are logged, unless it is 0
+    # The start time is kept on the execution context, which is discarded with
+    # the statement when it fails. The few statements SQLAlchemy runs without
+    # one (dialect internals) are not timed.
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(connection, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def observe(connection, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "query_start_time", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        DB_QUERY_DURATION.observe(elapsed)
+        if slow_threshold and elapsed >= slow_threshold:
+            # Parameters are left out: they hold spec content and token hashes
+            logger.warning(
+                "Slow query (%.0f ms): %s",
+                elapsed * 1000,
+                statement[:SLOW_QUERY_LOG_MAX_CHARS],
+            )
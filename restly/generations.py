@@ -0,0 +1,370 @@
+import logging
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import delete, insert, select
+
+from .db import db
+from .llm import LLMError, llm_provider
+from .llm_cache import cached_completion, completion_key, store_completion
+from .models import (
+    GENERATION_STATUS_DONE,
+    GENERATION_STATUS_FAILED,
+    GENERATION_STATUS_RUNNING,
+    Generation,
+    GenerationChunk,
+    Tutorial,
+)
+from .streaming import coalesce_chunks
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationEvent:
+    # Event id: the number of chunks up to and including this one
+    seq: int
+    # None for the final event, which carries the outcome instead
+    content: Optional[str] = None
+    status: str = GENERATION_STATUS_RUNNING
+    error: Optional[str] = None
+
+
+class LiveGeneration:
+    """
+    In-memory log of a generation being produced by this process. Viewers in
+    the same process are woken up as chunks arrive instead of polling the
+    database.
+    """
+
+    def __init__(self):
+        self._chunks: list[str] = []
+        self._status = GENERATION_STATUS_RUNNING
+        self._error: Optional[str] = None
+        self._condition = threading.Condition()
+
+    def append(self, chunk: str):
+        with self._condition:
+            self._chunks.append(chunk)
+            self._condition.notify_all()
+
+    def finish(self, status: str, error: Optional[str] = None):
+        with self._condition:
+            self._status = status
+            self._error = error
+            self._condition.notify_all()
+
+    def read(self, after: int, timeout: float) -> tuple[list[str], str, Optional[str]]:
+        """
+        Returns the chunks after the first `after` ones, waiting up to timeout
+        seconds for more if there are none yet, along with the status.
+        """
+        with self._condition:
+            if len(self._chunks) <= after and self._status == GENERATION_STATUS_RUNNING:
+                self._condition.wait(timeout)
+            return self._chunks[after:], self._status, self._error
+
+    def content(self) -> str:
+        with self._condition:
+            return "".join(self._chunks)
+
+
+# Generations produced by this process, by id
+_live: dict[int, LiveGeneration] = {}
+_live_lock = threading.Lock()
+
+
+def start_generation(
+    tutorial: Tutorial,
+    spec_id: int,
+    query: str,
+    relevant_apis: str,
+    server: str,
+    prompt: str,
+    bypass_cache: bool = False,
+) -> Generation:
+    """
+    Records a generation and starts producing it on a background thread (a
+    greenlet under gevent). It runs to completion whether or not anyone is
+    watching. A cached completion of the same prompt is replayed unless
+    bypass_cache is set.
+    """
+    generation = create_generation(tutorial, spec_id, query, relevant_apis, server)
+    db.session.commit()
+
+    live = _register(generation.id)
+    threading.Thread(
+        target=_produce,
+        args=(
+            current_app._get_current_object(),
+            generation.id,
+            prompt,
+            bypass_cache,
+            live,
+        ),
+        name=f"generation-{generation.id}",
+        daemon=True,
+    ).start()
+    return generation
+
+
+def create_generation(
+    tutorial: Tutorial, spec_id: int, query: str, relevant_apis: str, server: str
+) -> Generation:
+    """
+    Records a generation without committing the session, for callers that
+    produce it themselves with produce_generation.
+    """
+    generation = Generation(
+        tutorial_id=tutorial.id,
+        user_id=tutorial.user_id,
+        spec_id=spec_id,
+        input=query,
+        relevant_apis=relevant_apis,
+        server=server,
+    )
+    db.session.add(generation)
+    db.session.flush()
+    return generation
+
+
+def produce_generation(generation_id: int, prompt: str, bypass_cache: bool = False):
+    """
+    Produces a committed generation in the calling thread, returning once it
+    finished. Same as what start_generation runs in the background.
+    """
+    live = _register(generation_id)
+    _produce(
+        current_app._get_current_object(), generation_id, prompt, bypass_cache, live
+    )
+
+
+def running_generation(tutorial_id: int) -> Optional[Generation]:
+    """
+    The tutorial's in-flight generation, if any. Ones whose producer stopped
+    reporting are not considered running.
+    """
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config["GENERATION_STALE_AFTER"]
+    )
+    return (
+        Generation.query.filter(
+            Generation.tutorial_id == tutorial_id,
+            Generation.status == GENERATION_STATUS_RUNNING,
+            Generation.heartbeat_at >= stale_before,
+        )
+        .order_by(Generation.id.desc())
+        .first()
+    )
+
+
+def follow_generation(
+    generation_id: int, after: int = 0
+) -> Iterator[Optional[GenerationEvent]]:
+    """
+    Yields the generation's chunks after the first `after` ones as they are
+    produced, then a final event with its outcome. None is yielded when
+    nothing happened for SSE_KEEPALIVE_INTERVAL seconds, so that callers can
+    keep idle connections alive.
+    """
+    with _live_lock:
+        live = _live.get(generation_id)
+    if live is not None:
+        yield from _follow_live(live, after)
+    else:
+        yield from _follow_stored(generation_id, after)
+
+
+def _follow_live(
+    live: LiveGeneration, after: int
+) -> Iterator[Optional[GenerationEvent]]:
+    keepalive = current_app.config["SSE_KEEPALIVE_INTERVAL"]
+    while True:
+        chunks, status, error = live.read(after, keepalive)
+        for chunk in chunks:
+            after += 1
+            yield GenerationEvent(seq=after, content=chunk)
+        if status != GENERATION_STATUS_RUNNING and not chunks:
+            yield GenerationEvent(seq=after, status=status, error=error)
+            return
+        if not chunks:
+            yield None
+
+
+def _follow_stored(
+    generation_id: int, after: int
+) -> Iterator[Optional[GenerationEvent]]:
+    # Produced by another process (or already finished): poll the chunk log
+    config = current_app.config
+    stale_after = timedelta(seconds=config["GENERATION_STALE_AFTER"])
+    idle = 0.0
+    while True:
+        # The status is read first: chunks are committed no later than it
+        generation = db.session.execute(
+            select(Generation.status, Generation.error, Generation.heartbeat_at).where(
+                Generation.id == generation_id
+            )
+        ).one()
+        rows = db.session.execute(
+            select(GenerationChunk.seq, GenerationChunk.content)
+            .where(
+                GenerationChunk.generation_id == generation_id,
+                GenerationChunk.seq > after,
+            )
+            .order_by(GenerationChunk.seq)
+        ).all()
+        # Don't hold a connection between polls
+        db.session.close()
+
+        for seq, content in rows:
+            after = seq
+            yield GenerationEvent(seq=seq, content=content)
+
+        if generation.status != GENERATION_STATUS_RUNNING:
+            yield GenerationEvent(
+                seq=after, status=generation.status, error=generation.error
+            )
+            return
+        if generation.heartbeat_at < datetime.utcnow() - stale_after:
+            yield GenerationEvent(
+                seq=after,
+                status=GENERATION_STATUS_FAILED,
+                error="Generation was interrupted",
+            )
+            return
+
+        if rows:
+            idle = 0.0
+        elif idle >= config["SSE_KEEPALIVE_INTERVAL"]:
+            idle = 0.0
+            yield None
+        time.sleep(config["GENERATION_POLL_INTERVAL"])
+        idle += config["GENERATION_POLL_INTERVAL"]
+
+
+def _register(generation_id: int) -> LiveGeneration:
+    live = LiveGeneration()
+    with _live_lock:
+        _live[generation_id] = live
+    return live
+
+
+def _produce(
+    app: Flask,
+    generation_id: int,
+    prompt: str,
+    bypass_cache: bool,
+    live: LiveGeneration,
+):
+    with app.app_context():
+        config = app.config
+        provider = llm_provider()
+        key = completion_key(
+            provider=provider.name,
+            model=provider.model,
+            prompt=prompt,
+            json_response=False,
+            temperature=0,
+        )
+        flushed = 0
+        last_flush = datetime.utcnow()
+        status, error = GENERATION_STATUS_DONE, None
+        try:
+            cached = None if bypass_cache else cached_completion(key)
+            if cached is not None:
+                live.append(cached)
+            else:
+                # Don't hold a connection until the first flush
+                db.session.close()
+                with closing(provider.stream(prompt)) as tokens:
+                    for chunk in coalesce_chunks(
+                        tokens,
+                        config["STREAM_COALESCE_MIN_CHARS"],
+                        config["STREAM_COALESCE_MAX_DELAY"],
+                    ):
+                        live.append(chunk)
+                        now = datetime.utcnow()
+                        if (now - last_flush).total_seconds() >= config[
+                            "GENERATION_FLUSH_INTERVAL"
+                        ]:
+                            flushed = _flush(generation_id, live, flushed)
+                            db.session.commit()
+                            last_flush = now
+                # Partial completions are not cached
+                store_completion(key, provider.model, live.content())
+        except LLMError as e:
+            # Already logged by the provider
+            db.session.rollback()
+            status, error = GENERATION_STATUS_FAILED, f"Generation failed: {e}"
+        except Exception as e:
+            logger.exception("Generation %s failed", generation_id)
+            db.session.rollback()
+            status, error = GENERATION_STATUS_FAILED, f"Generation failed: {e}"
+
+        try:
+            _finish(generation_id, live, flushed, status, error)
+        except Exception:
+            logger.exception("Could not save generation %s", generation_id)
+            db.session.rollback()
+            status, error = GENERATION_STATUS_FAILED, "Could not save generation"
+        finally:
+            db.session.remove()
+            live.finish(status, error)
+            with _live_lock:
+                _live.pop(generation_id, None)
+
+
+def _flush(generation_id: int, live: LiveGeneration, flushed: int) -> int:
+    """
+    Logs the chunks produced since the last flush and bumps the heartbeat.
+    Returns the number of chunks logged so far.
+    """
+    chunks, _, _ = live.read(flushed, timeout=0)
+    if chunks:
+        db.session.execute(
+            insert(GenerationChunk),
+            [
+                {"generation_id": generation_id, "seq": seq, "content": chunk}
+                for seq, chunk in enumerate(chunks, start=flushed + 1)
+            ],
+        )
+    generation = db.session.get(Generation, generation_id)
+    generation.chunk_count = flushed + len(chunks)
+    generation.heartbeat_at = datetime.utcnow()
+    return generation.chunk_count
+
+
+def _finish(
+    generation_id: int,
+    live: LiveGeneration,
+    flushed: int,
+    status: str,
+    error: Optional[str],
+):
+    _flush(generation_id, live, flushed)
+    generation = db.session.get(Generation, generation_id)
+    generation.status = status
+    generation.error = error
+
+    # Partial output is kept on failure, as it was before generations existed
+    tutorial = db.session.get(Tutorial, generation.tutorial_id)
+    tutorial.content = live.content()
+    tutorial.input = generation.input
+    tutorial.relevant_apis = generation.relevant_apis
+    tutorial.spec_id = generation.spec_id
+    tutorial.server = generation.server
+
+    # Only the latest generation of a tutorial can still be resumed
+    previous = select(Generation.id).where(
+        Generation.tutorial_id == generation.tutorial_id,
+        Generation.id < generation_id,
+    )
+    db.session.execute(
+        delete(GenerationChunk).where(GenerationChunk.generation_id.in_(previous))
+    )
+    db.session.commit()
@@ -0,0 +1,173 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+import yaml
+
+from .offload import run_cpu_bound
+from .serialization import loads
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+
+YAML_CONTENT_TYPES = (
+    "application/yaml",
+    "application/x-yaml",
+    "text/yaml",
+    "text/x-yaml",
+)
+YAML_SUFFIXES = (".yaml", ".yml")
+
+DEFAULT_SPEC_TITLE = "unknown"
+DEFAULT_SPEC_VERSION = "1.0.0"
+
+
+class SpecFetchError(Exception):
+    """
+    Raised when a spec cannot be downloaded or parsed. The message is safe to
+    return to the client.
+    """
+
+
+@dataclass
+class FetchedSpec:
+    content: dict
+    # Canonical serialization of content, the only copy that gets stored. Always
+    # the json module's, so that its hash does not depend on the JSON backend.
+    raw: str
+    # Validators for conditional re-fetches, if the server sent any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def fetch_spec(
+    url: str,
+    max_bytes: int,
+    connect_timeout: float,
+    read_timeout: float,
+    total_timeout: float,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> Optional[FetchedSpec]:
+    """
+    Downloads a JSON or YAML spec, streaming the body so that it is never held
+    more than once and giving up as soon as it grows past max_bytes. gzip and
+    brotli (when installed) responses are decompressed transparently and the
+    limit applies to the decompressed size.
+
+    When validators from a previous fetch are given the request is conditional,
+    and None is returned if the server answers 304 Not Modified.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    response = _download(
+        url, headers, max_bytes, connect_timeout, read_timeout, total_timeout
+    )
+    if response is None:
+        return None
+    body, response_headers = response
+
+    content, raw = run_cpu_bound(
+        _decode_spec, body, response_headers.get("Content-Type", ""), url
+    )
+    del body
+
+    return FetchedSpec(
+        content=content,
+        raw=raw,
+        etag=response_headers.get("ETag"),
+        last_modified=response_headers.get("Last-Modified"),
+    )
+
+
+def _decode_spec(body: bytearray, content_type: str, url: str) -> tuple[dict, str]:
+    # Parsed content and its canonical serialization
+    content = parse_spec(body, content_type, url)
+    if not isinstance(content, dict):
+        raise SpecFetchError("Spec must be a JSON or YAML object")
+    # YAML may contain values without a JSON equivalent (dates, mostly)
+    return content, json.dumps(content, default=str)
+
+
+def spec_name(content: dict) -> str:
+    spec_info = content.get("info")
+    if not isinstance(spec_info, dict):
+        spec_info = {}
+    spec_title = spec_info.get("title")
+    if not isinstance(spec_title, str):
+        spec_title = DEFAULT_SPEC_TITLE
+    spec_version = spec_info.get("version")
+    # YAML reads an unquoted version such as 1.0 as a number
+    if isinstance(spec_version, bool) or not isinstance(
+        spec_version, (str, int, float)
+    ):
+        spec_version = DEFAULT_SPEC_VERSION
+    return f"{spec_title} - {spec_version}"
+
+
+def parse_spec(body: bytearray, content_type: str, url: str):
+    """
+    Parses a JSON or YAML document, guessing the format from the content type
+    and the URL and falling back to YAML (a superset of JSON) when unsure.
+    """
+    content_type = content_type.split(";")[0].strip().lower()
+    path = requests.utils.urlparse(url).path.lower()
+    is_yaml = content_type in YAML_CONTENT_TYPES or path.endswith(YAML_SUFFIXES)
+
+    if not is_yaml:
+        try:
+            return loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+
+    try:
+        return yaml.load(bytes(body), Loader=YamlLoader)
+    except yaml.YAMLError:
+        raise SpecFetchError("Spec is neither valid JSON nor valid YAML")
+
+
+def _download(
+    url: str,
+    headers: dict,
+    max_bytes: int,
+    connect_timeout: float,
+    read_timeout: float,
+    total_timeout: float,
+) -> Optional[tuple[bytearray, requests.structures.CaseInsensitiveDict]]:
+    deadline = time.monotonic() + total_timeout
+    try:
+        with requests.get(
+            url,
+            headers=headers,
+            stream=True,
+            timeout=(connect_timeout, read_timeout),
+        ) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+
+            declared_size = response.headers.get("Content-Length", "")
+            if declared_size.isdigit() and int(declared_size) > max_bytes:
+                raise SpecFetchError(f"Spec is larger than {max_bytes} bytes")
+
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    raise SpecFetchError(f"Spec is larger than {max_bytes} bytes")
+                if time.monotonic() > deadline:
+                    raise SpecFetchError(
+                        f"Spec download took longer than {total_timeout} seconds"
+                    )
+            return body, response.headers
+    except requests.RequestException as e:
+        raise SpecFetchError(f"Could not fetch spec: {e}")
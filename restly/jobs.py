@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, update
+
+from .db import db
+from .ingest import FetchedSpec, SpecFetchError, fetch_spec, spec_name
+from .metrics import timed
+from .models import (
+    JOB_STATUS_DONE,
+    JOB_STATUS_FAILED,
+    JOB_STATUS_QUEUED,
+    JOB_STATUS_RUNNING,
+    SPEC_STATUS_FAILED,
+    SPEC_STATUS_READY,
+    Spec,
+    SpecBlob,
+    SpecIngestJob,
+    hash_content,
+)
+from .spec_index import refresh_spec_index
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_spec(
+    spec: Spec, on_progress: Callable[[str], None] = lambda stage: None
+) -> Optional[FetchedSpec]:
+    """
+    Fetches, stores and indexes the spec at spec.url. Specs fetched before are
+    re-fetched conditionally, and the index is only rebuilt when the content
+    actually changed. Returns the fetched spec, or None if it was unchanged.
+
+    Raises SpecFetchError when the spec cannot be downloaded or parsed, in which
+    case nothing is written.
+    """
+    config = current_app.config
+
+    on_progress("fetching")
+    with timed("spec_fetch"):
+        fetched = fetch_spec(
+            spec.url,
+            max_bytes=config["SPEC_MAX_BYTES"],
+            connect_timeout=config["SPEC_FETCH_CONNECT_TIMEOUT"],
+            read_timeout=config["SPEC_FETCH_READ_TIMEOUT"],
+            total_timeout=config["SPEC_FETCH_TOTAL_TIMEOUT"],
+            etag=spec.etag if spec.content_hash else None,
+            last_modified=spec.last_modified if spec.content_hash else None,
+        )
+    spec.fetched_at = datetime.utcnow()
+
+    if fetched is None or hash_content(fetched.raw) == spec.content_hash:
+        # 304 Not Modified, or modified in name only
+        if fetched is not None:
+            spec.etag = fetched.etag
+            spec.last_modified = fetched.last_modified
+        spec.error = None
+        db.session.add(spec)
+        db.session.commit()
+        return None
+
+    on_progress("indexing")
+    previous_hash = spec.content_hash
+    spec.name = spec_name(fetched.content)
+    spec.blob = SpecBlob.get_or_create(fetched.raw)
+    spec.etag = fetched.etag
+    spec.last_modified = fetched.last_modified
+    spec.status = SPEC_STATUS_READY
+    spec.error = None
+    db.session.add(spec)
+    db.session.flush()
+    if previous_hash is not None:
+        SpecBlob.delete_if_unused(previous_hash)
+    # Commits the spec together with its index
+    refresh_spec_index(spec, fetched.content)
+    return fetched
+
+
+def enqueue_ingest(spec: Spec) -> SpecIngestJob:
+    """
+    Queues a background ingestion (or refresh) for a spec, unless one is
+    already queued or running. Commits the session.
+    """
+    job = SpecIngestJob.query.filter(
+        SpecIngestJob.spec_id == spec.id,
+        SpecIngestJob.status.in_([JOB_STATUS_QUEUED, JOB_STATUS_RUNNING]),
+    ).first()
+    if job is not None:
+        return job
+
+    job = SpecIngestJob(spec_id=spec.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next_job(stale_after: timedelta) -> Optional[SpecIngestJob]:
+    """
+    Atomically claims the oldest queued job, or a running one whose worker
+    stopped updating it (e.g. it was killed mid-fetch).
+    """
+    now = datetime.utcnow()
+    job = (
+        SpecIngestJob.query.filter(
+            or_(
+                SpecIngestJob.status == JOB_STATUS_QUEUED,
+                and_(
+                    SpecIngestJob.status == JOB_STATUS_RUNNING,
+                    SpecIngestJob.locked_at < now - stale_after,
+                ),
+            )
+        )
+        .order_by(SpecIngestJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.session.rollback()
+        return None
+
+    # Row locks are not available everywhere (SQLite): only one worker gets to
+    # move the job on from the state it was found in
+    claimed = db.session.execute(
+        update(SpecIngestJob)
+        .where(
+            SpecIngestJob.id == job.id,
+            SpecIngestJob.status == job.status,
+            SpecIngestJob.attempts == job.attempts,
+        )
+        .values(status=JOB_STATUS_RUNNING, locked_at=now, attempts=job.attempts + 1)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return job
+
+
+def run_job(job: SpecIngestJob):
+    config = current_app.config
+    spec = db.session.get(Spec, job.spec_id)
+
+    if job.attempts > config["SPEC_INGEST_MAX_ATTEMPTS"]:
+        # Reclaimed after its worker died too many times
+        _fail(job, spec, "Ingestion did not complete")
+        return
+
+    def on_progress(stage: str):
+        job.progress = stage
+        job.locked_at = datetime.utcnow()
+        db.session.add(job)
+        db.session.commit()
+
+    try:
+        ingest_spec(spec, on_progress)
+    except SpecFetchError as e:
+        # Bad URL or document: retrying will not help
+        _fail(job, spec, str(e))
+        return
+    except Exception:
+        logger.exception("Ingest job %s failed", job.id)
+        db.session.rollback()
+        if job.attempts >= config["SPEC_INGEST_MAX_ATTEMPTS"]:
+            _fail(job, spec, "Internal error while ingesting spec")
+        else:
+            job.status = JOB_STATUS_QUEUED
+            db.session.add(job)
+            db.session.commit()
+        return
+
+    job.status = JOB_STATUS_DONE
+    job.progress = "done"
+    job.error = None
+    db.session.add(job)
+    db.session.commit()
+
+
+def _fail(job: SpecIngestJob, spec: Spec, error: str):
+    job.status = JOB_STATUS_FAILED
+    job.error = error
+    if spec.content_hash is None:
+        # A failed refresh leaves the previously fetched content usable
+        spec.status = SPEC_STATUS_FAILED
+    spec.error = error
+    db.session.add_all([job, spec])
+    db.session.commit()
+
+
+class IngestWorkerPool:
+    """
+    Threads that poll the spec_ingest_job table and run jobs, each within its
+    own app context. Several pools (processes) can share one database.
+    """
+
+    def __init__(self, app: Flask, threads: int):
+        self._app = app
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            for i in range(threads)
+        ]
+        self._stopping = threading.Event()
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        config = self._app.config
+        stale_after = timedelta(seconds=config["SPEC_INGEST_STALE_AFTER"])
+        while not self._stopping.is_set():
+            with self._app.app_context():
+                try:
+                    job = claim_next_job(stale_after)
+                    if job is not None:
+                        logger.info("Running ingest job %s", job.id)
+                        run_job(job)
+                        continue
+                except Exception:
+                    logger.exception("Ingest worker error")
+                    db.session.rollback()
+            self._stopping.wait(config["SPEC_INGEST_POLL_INTERVAL"])
+
+
+@click.command("ingest-worker")
+@click.option("--threads", default=4, show_default=True, help="Concurrent jobs.")
+@with_appcontext
+def ingest_worker_command(threads: int):
+    """Run background spec ingestion jobs until interrupted."""
+    pool = IngestWorkerPool(current_app._get_current_object(), threads)
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
+        pool.join()
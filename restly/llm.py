@@ -0,0 +1,314 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+import httpx
+import openai
+from flask import current_app
+
+from .metrics import (
+    LLM_ERRORS,
+    LLM_REQUEST_DURATION,
+    LLM_RETRIES,
+    LLM_STREAM_DURATION,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS_PER_SECOND,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """
+    Raised when a completion cannot be obtained. The message is safe to return
+    to the client.
+    """
+
+
+class LLMUnavailableError(LLMError):
+    """
+    Raised when the provider's concurrency limit stays saturated for longer
+    than its queue timeout.
+    """
+
+
+class LLMProvider:
+    """
+    A language model backend. Calls are limited to max_concurrency at a time per
+    process (streams hold their slot until closed), and failures the provider
+    deems transient are retried with exponential backoff and jitter.
+    """
+
+    name: str
+    # Provider-specific exceptions that are turned into LLMError
+    errors: tuple[type[Exception], ...] = ()
+
+    def __init__(
+        self,
+        model: str,
+        max_concurrency: int,
+        queue_timeout: float,
+        max_retries: int,
+        retry_backoff: float,
+    ):
+        self.model = model
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @classmethod
+    def from_config(cls, config) -> "LLMProvider":
+        return cls(**_common_options(config))
+
+    def complete(
+        self, prompt: str, json_response: bool = False, temperature: float = 0
+    ) -> str:
+        with self._slot():
+            start = time.perf_counter()
+            content = self._retry(
+                lambda: self._complete(prompt, json_response, temperature)
+            )
+        LLM_REQUEST_DURATION.labels(self.name, self.model).observe(
+            time.perf_counter() - start
+        )
+        return content
+
+    def stream(self, prompt: str, temperature: float = 0) -> Iterator[str]:
+        """
+        Yields the completion as it is generated. Close the iterator (or
+        exhaust it) to release the connection and the concurrency slot.
+        """
+        with self._slot():
+            start = time.perf_counter()
+            chunks, close = self._retry(lambda: self._open_stream(prompt, temperature))
+            first = None
+            count = 0
+            try:
+                for chunk in chunks:
+                    if first is None:
+                        first = time.perf_counter()
+                        LLM_TIME_TO_FIRST_TOKEN.labels(self.name, self.model).observe(
+                            first - start
+                        )
+                    count += 1
+                    yield chunk
+            except self.errors as e:
+                # Not retried: part of the completion was already consumed
+                logger.warning("%s stream failed: %s", self.name, e)
+                LLM_ERRORS.labels(self.name).inc()
+                raise LLMError("The language model request failed") from e
+            finally:
+                close()
+
+            # Only streams read to the end are measured
+            end = time.perf_counter()
+            LLM_STREAM_DURATION.labels(self.name, self.model).observe(end - start)
+            if count > 1 and end > first:
+                LLM_TOKENS_PER_SECOND.labels(self.name, self.model).observe(
+                    (count - 1) / (end - first)
+                )
+
+    def _complete(self, prompt: str, json_response: bool, temperature: float) -> str:
+        raise NotImplementedError
+
+    def _open_stream(
+        self, prompt: str, temperature: float
+    ) -> tuple[Iterator[str], Callable[[], None]]:
+        """
+        Starts a streamed completion, returning its chunks and a function that
+        releases it. Errors raised before returning are retried.
+        """
+        raise NotImplementedError
+
+    def _retryable(self, error: Exception) -> bool:
+        return False
+
+    @contextmanager
+    def _slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMUnavailableError(
+                "Too many concurrent language model requests, try again later"
+            )
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _retry(self, call):
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except self.errors as e:
+                if attempt >= self.max_retries or not self._retryable(e):
+                    logger.warning("%s request failed: %s", self.name, e)
+                    LLM_ERRORS.labels(self.name).inc()
+                    raise LLMError("The language model request failed") from e
+                delay = self.retry_backoff * 2**attempt * random.uniform(0.5, 1)
+                logger.info(
+                    "%s request failed (%s), retrying in %.1f s", self.name, e, delay
+                )
+                LLM_RETRIES.labels(self.name).inc()
+            time.sleep(delay)
+            attempt += 1
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    # The SDK only wraps errors raised before a response arrives: a stream that
+    # breaks while its body is read raises httpx's own (ReadError, read
+    # timeouts, RemoteProtocolError, ...)
+    errors = (openai.OpenAIError, httpx.TransportError)
+
+    def __init__(self, timeout: float, connect_timeout: float, **options):
+        super().__init__(**options)
+        # One connection per concurrent request, kept alive between requests
+        limits = httpx.Limits(
+            max_connections=options["max_concurrency"], max_keepalive_connections=100
+        )
+        self._client = openai.OpenAI(
+            http_client=httpx.Client(limits=limits),
+            # For streams, the read timeout applies between chunks
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            # Retried by LLMProvider instead
+            max_retries=0,
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "OpenAIProvider":
+        return cls(
+            timeout=config["LLM_TIMEOUT"],
+            connect_timeout=config["LLM_CONNECT_TIMEOUT"],
+            **_common_options(config),
+        )
+
+    def _complete(self, prompt: str, json_response: bool, temperature: float) -> str:
+        options = {"response_format": {"type": "json_object"}} if json_response else {}
+        completion = self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            **options,
+        )
+        return completion.choices[0].message.content
+
+    def _open_stream(
+        self, prompt: str, temperature: float
+    ) -> tuple[Iterator[str], Callable[[], None]]:
+        completion = self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+        )
+
+        def chunks():
+            for chunk in completion:
+                for choice in chunk.choices:
+                    if choice.delta.content is not None:
+                        yield choice.delta.content
+
+        return chunks(), completion.response.close
+
+    def _retryable(self, error: Exception) -> bool:
+        # Connection errors include timeouts
+        return isinstance(
+            error,
+            (
+                openai.APIConnectionError,
+                openai.RateLimitError,
+                openai.InternalServerError,
+            ),
+        )
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local stand-in: returns a canned completion and streams
+    numbered tokens at a fixed rate, so that the API can be exercised and load
+    tested without network access or an API key.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        completion: str,
+        tokens: int,
+        tokens_per_second: float,
+        latency: float,
+        **options,
+    ):
+        super().__init__(**options)
+        self.completion = completion
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        # Delay before the completion or its first token
+        self.latency = latency
+
+    @classmethod
+    def from_config(cls, config) -> "FakeProvider":
+        return cls(
+            completion=config["LLM_FAKE_COMPLETION"],
+            tokens=config["LLM_FAKE_TOKENS"],
+            tokens_per_second=config["LLM_FAKE_TOKENS_PER_SECOND"],
+            latency=config["LLM_FAKE_LATENCY"],
+            **_common_options(config),
+        )
+
+    def _complete(self, prompt: str, json_response: bool, temperature: float) -> str:
+        time.sleep(self.latency)
+        return self.completion
+
+    def _open_stream(
+        self, prompt: str, temperature: float
+    ) -> tuple[Iterator[str], Callable[[], None]]:
+        time.sleep(self.latency)
+        return self._tokens(), lambda: None
+
+    def _tokens(self) -> Iterator[str]:
+        interval = 1 / self.tokens_per_second
+        start = time.monotonic()
+        for i in range(self.tokens):
+            yield f"token{i} "
+            # Scheduled against the start time so that the rate does not drift
+            time.sleep(max(0.0, start + (i + 1) * interval - time.monotonic()))
+
+
+# LLM_PROVIDER values
+PROVIDERS: dict[str, type[LLMProvider]] = {
+    OpenAIProvider.name: OpenAIProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def llm_provider() -> LLMProvider:
+    """
+    Process-wide provider selected by LLM_PROVIDER, so that connections and TLS
+    setup are reused across requests. Created on first use, i.e. after
+    gunicorn has forked the worker.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                config = current_app.config
+                _provider = PROVIDERS[config["LLM_PROVIDER"]].from_config(config)
+    return _provider
+
+
+def _common_options(config) -> dict:
+    return {
+        "model": config["LLM_MODEL"],
+        "max_concurrency": config["LLM_MAX_CONCURRENCY"],
+        "queue_timeout": config["LLM_QUEUE_TIMEOUT"],
+        "max_retries": config["LLM_MAX_RETRIES"],
+        "retry_backoff": config["LLM_RETRY_BACKOFF"],
+    }
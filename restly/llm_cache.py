@@ -0,0 +1,135 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .db import db
+from .models import LLMResponse, hash_content
+from .spec_index import IN_CLAUSE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Eviction sums the sizes of the whole table, so each process only evicts once
+# it has stored this fraction of LLM_CACHE_MAX_BYTES since it last did. The
+# cache can overshoot its budget by that much per process in between.
+EVICT_EVERY_FRACTION = 1 / 32
+
+# Bytes stored by this process since it last evicted
+_stored_bytes = 0
+_stored_lock = threading.Lock()
+
+
+def completion_key(**params) -> str:
+    """
+    Cache key for a completion request: the hash of everything sent to the
+    model. Prompts embed the spec, so a changed spec is a different key.
+    """
+    return hash_content(json.dumps(params, sort_keys=True, separators=(",", ":")))
+
+
+def cached_completion(key: str) -> Optional[str]:
+    """
+    Returns the stored completion for key unless it expired, marking it as
+    recently used.
+    """
+    if not current_app.config["LLM_CACHE_ENABLED"]:
+        return None
+    now = datetime.utcnow()
+    content = db.session.scalar(
+        select(LLMResponse.content).where(
+            LLMResponse.key == key, LLMResponse.expires_at > now
+        )
+    )
+    if content is not None:
+        db.session.execute(
+            update(LLMResponse).where(LLMResponse.key == key).values(used_at=now)
+        )
+        db.session.commit()
+        logger.debug("LLM cache hit %s", key)
+    return content
+
+
+def store_completion(key: str, model: str, content: str):
+    """
+    Stores a completion, replacing any previous one for key, then every so often
+    (see EVICT_EVERY_FRACTION) evicts expired and least recently used responses
+    down to LLM_CACHE_MAX_BYTES. Commits the session.
+    """
+    config = current_app.config
+    if not config["LLM_CACHE_ENABLED"]:
+        return
+    now = datetime.utcnow()
+    values = {
+        "model": model,
+        "content": content,
+        "size": len(content.encode("utf-8")),
+        "expires_at": now + timedelta(seconds=config["LLM_CACHE_TTL"]),
+        "used_at": now,
+    }
+    db.session.execute(delete(LLMResponse).where(LLMResponse.key == key))
+    try:
+        with db.session.begin_nested():
+            db.session.add(LLMResponse(key=key, **values))
+    except IntegrityError:
+        # Stored concurrently by an identical request
+        pass
+    if _due_for_eviction(values["size"], config["LLM_CACHE_MAX_BYTES"]):
+        _evict(config["LLM_CACHE_MAX_BYTES"], now)
+    db.session.commit()
+
+
+def _due_for_eviction(size: int, max_bytes: int) -> bool:
+    global _stored_bytes
+    with _stored_lock:
+        _stored_bytes += size
+        if _stored_bytes < max_bytes * EVICT_EVERY_FRACTION:
+            return False
+        _stored_bytes = 0
+        return True
+
+
+def _evict(max_bytes: int, now: datetime):
+    db.session.execute(delete(LLMResponse).where(LLMResponse.expires_at <= now))
+    excess = (
+        db.session.scalar(select(func.coalesce(func.sum(LLMResponse.size), 0)))
+        - max_bytes
+    )
+
+    evicted = 0
+    while excess > 0:
+        # Oldest first, a page at a time along the used_at index
+        rows = db.session.execute(
+            select(LLMResponse.key, LLMResponse.size)
+            .order_by(LLMResponse.used_at)
+            .limit(IN_CLAUSE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        keys = []
+        for key, size in rows:
+            keys.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        db.session.execute(delete(LLMResponse).where(LLMResponse.key.in_(keys)))
+        evicted += len(keys)
+    if evicted:
+        logger.info("Evicted %s LLM responses", evicted)
+
+
+def llm_cache_stats() -> dict:
+    entries, size = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(LLMResponse.size), 0)).select_from(
+            LLMResponse
+        )
+    ).one()
+    return {
+        "entries": entries,
+        "bytes": size,
+        "max_bytes": current_app.config["LLM_CACHE_MAX_BYTES"],
+    }
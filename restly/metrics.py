@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+from flask import Flask, g, request
+from prometheus_client import Counter, Histogram
+
+T = TypeVar("T")
+
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (read by prometheus_client) so
+# that /metrics aggregates every worker process rather than the one that
+# happens to serve the scrape. Only counters and histograms are used, which
+# need no multiprocess mode.
+
+REQUEST_DURATION = Histogram(
+    "restly_request_duration_seconds",
+    "Time to handle a request, including streaming its response",
+    ["method", "route", "status"],
+)
+STAGE_DURATION = Histogram(
+    "restly_stage_duration_seconds",
+    "Time spent in a stage of the spec and tutorial pipelines; stages nest",
+    ["stage"],
+)
+DB_QUERY_DURATION = Histogram(
+    "restly_db_query_duration_seconds",
+    "Time to execute a database statement",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PROMPT_BYTES = Histogram(
+    "restly_prompt_bytes",
+    "Size of the prompts sent to the model",
+    ["prompt"],
+    buckets=[1024 * 4**i for i in range(9)],
+)
+PROMPT_TOKENS = Histogram(
+    "restly_prompt_tokens",
+    "Tokens of the prompts sent to the model",
+    ["prompt"],
+    buckets=(250, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000),
+)
+LLM_REQUEST_DURATION = Histogram(
+    "restly_llm_request_duration_seconds",
+    "Time to get a complete (non-streamed) completion, including retries",
+    ["provider", "model"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "restly_llm_time_to_first_token_seconds",
+    "Time from requesting a streamed completion to its first chunk",
+    ["provider", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "restly_llm_tokens_per_second",
+    "Rate of streamed chunks (about a token each) after the first one",
+    ["provider", "model"],
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 200, 500),
+)
+LLM_STREAM_DURATION = Histogram(
+    "restly_llm_stream_duration_seconds",
+    "Time from requesting a streamed completion to its last chunk",
+    ["provider", "model"],
+    buckets=(1, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+LLM_ERRORS = Counter(
+    "restly_llm_errors_total",
+    "Language model requests that failed after any retries",
+    ["provider"],
+)
+LLM_RETRIES = Counter(
+    "restly_llm_retries_total",
+    "Language model requests retried after a transient failure",
+    ["provider"],
+)
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+def timed_call(stage: str, fn: Callable[[], T]) -> T:
+    with timed(stage):
+        return fn()
+
+
+def observe_prompt(prompt_name: str, prompt: str, tokens: int):
+    PROMPT_BYTES.labels(prompt_name).observe(len(prompt.encode("utf-8")))
+    PROMPT_TOKENS.labels(prompt_name).observe(tokens)
+
+
+def init_metrics(app: Flask):
+    """
+    Times every request. Streamed responses are timed until the stream ends,
+    when the request context is torn down.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def observe_request(exc):
+        started = g.pop("request_started", None)
+        if started is None:
+            return
+        # The rule rather than the path, which would make a series per id
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        status = 500 if exc is not None else g.pop("response_status", 500)
+        REQUEST_DURATION.labels(request.method, route, str(status)).observe(
+            time.perf_counter() - started
+        )
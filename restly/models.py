@@ -1,16 +1,78 @@
+import gzip
 from datetime import datetime
+from hashlib import sha256
+from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import func
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import delete, exists, func, literal_column
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from restly.db import db
+from restly.offload import run_cpu_bound
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 def generate_user_token() -> str:
     return uuid4().hex
 
 
+SPEC_STATUS_PENDING = "pending"
+SPEC_STATUS_READY = "ready"
+SPEC_STATUS_FAILED = "failed"
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+GENERATION_STATUS_RUNNING = "running"
+GENERATION_STATUS_DONE = "done"
+GENERATION_STATUS_FAILED = "failed"
+
+BATCH_ITEM_STATUS_QUEUED = "queued"
+# Handed to a generation, which tracks its progress from then on
+BATCH_ITEM_STATUS_STARTED = "started"
+BATCH_ITEM_STATUS_FAILED = "failed"
+
+
+def hash_content(content: str) -> str:
+    return sha256(content.encode("utf-8")).hexdigest()
+
+
+def hash_token(token: str) -> str:
+    # Tokens are random, so a fast unsalted hash is enough to keep them secret
+    return sha256(token.encode("utf-8")).hexdigest()
+
+
+def compress_content(content: str) -> tuple[str, bytes]:
+    """
+    Compresses content with zstd when available, gzip otherwise. Returns the
+    encoding along with the data.
+    """
+    data = content.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=6)
+
+
+def decompress_content(encoding: str, data: bytes) -> bytes:
+    """
+    The UTF-8 content compressed by compress_content.
+    """
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-encoded specs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
 class TimestampMixin:
     created_at: Mapped[datetime] = mapped_column(
         db.DateTime, nullable=False, server_default=func.now()
@@ -19,36 +81,142 @@ class TimestampMixin:
         db.DateTime,
         nullable=False,
         server_default=func.now(),
-        server_onupdate=func.now(),
+        onupdate=func.now(),
     )
 
 
 class User(TimestampMixin, db.Model):
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(db.String, unique=True, nullable=True)
-    token: Mapped[str] = mapped_column(
-        db.String, nullable=False, default=lambda: generate_user_token(), unique=True
-    )
+    # Only the hash is stored; the token itself is shown to the user once
+    token_hash: Mapped[str] = mapped_column(db.String, nullable=False, unique=True)
+
+    def issue_token(self) -> str:
+        """
+        Replaces the user's token with a new one and returns it.
+        """
+        token = generate_user_token()
+        self.token_hash = hash_token(token)
+        return token
+
+
+class SpecBlob(TimestampMixin, db.Model):
+    """
+    Compressed spec content, addressed by the SHA-256 of its canonical JSON and
+    shared by every Spec with the same content.
+    """
+
+    __tablename__ = "spec_blob"
+
+    sha256: Mapped[str] = mapped_column(db.String, primary_key=True)
+    encoding: Mapped[str] = mapped_column(db.String, nullable=False)
+    # Uncompressed size in bytes
+    size: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(db.LargeBinary, nullable=False)
+
+    @staticmethod
+    def get_or_create(content: str) -> "SpecBlob":
+        """
+        Returns the blob for content, inserting it unless an identical one is
+        already stored.
+        """
+        content_hash = hash_content(content)
+        blob = db.session.get(SpecBlob, content_hash)
+        if blob is not None:
+            return blob
+
+        encoding, data = run_cpu_bound(compress_content, content)
+        blob = SpecBlob(
+            sha256=content_hash,
+            encoding=encoding,
+            size=len(content.encode("utf-8")),
+            data=data,
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(blob)
+        except IntegrityError:
+            # Stored concurrently by another request
+            blob = db.session.get(SpecBlob, content_hash)
+        return blob
+
+    @staticmethod
+    def delete_if_unused(content_hash: str):
+        """
+        Deletes the blob unless a Spec still references it, e.g. once the only
+        spec with that content has been refreshed to something else.
+        """
+        db.session.execute(
+            delete(SpecBlob).where(
+                SpecBlob.sha256 == content_hash,
+                ~exists().where(Spec.content_hash == content_hash),
+            ),
+            execution_options={"synchronize_session": "fetch"},
+        )
+
+    def text(self) -> str:
+        return self.raw().decode("utf-8")
+
+    def raw(self) -> bytes:
+        return decompress_content(self.encoding, self.data)
 
 
 class Spec(TimestampMixin, db.Model):
+    # Every lookup and listing is scoped to a user and paged by id
+    __table_args__ = (db.Index("ix_spec_user_id_id", "user_id", "id"),)
+
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(db.String, nullable=False)
     url: Mapped[str] = mapped_column(db.String, nullable=False)
-    content: Mapped[str] = mapped_column(db.String, nullable=False)
+    # SHA-256 of the content, which also keys caches without loading it. Null
+    # while the spec is pending.
+    content_hash: Mapped[Optional[str]] = mapped_column(
+        db.String, db.ForeignKey("spec_blob.sha256"), nullable=True
+    )
+    blob: Mapped[Optional[SpecBlob]] = relationship()
     user_id: Mapped[int] = mapped_column(
         db.Integer, db.ForeignKey("user.id"), nullable=False
     )
+    # Specs ingested in the background stay pending (with no content) until
+    # their SpecIngestJob finishes
+    status: Mapped[str] = mapped_column(
+        db.String,
+        nullable=False,
+        default=SPEC_STATUS_READY,
+        server_default=SPEC_STATUS_READY,
+    )
+    error: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+    # Validators from the last successful fetch, sent back on refresh
+    etag: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+    last_modified: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+    fetched_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime, nullable=True)
+
+    @property
+    def content(self) -> str:
+        """
+        The spec as canonical JSON, decompressed from its blob.
+        """
+        return self.blob.text() if self.blob is not None else ""
+
+    @property
+    def raw_content(self) -> bytes:
+        """
+        Spec.content as UTF-8 bytes, which can be parsed or sent as is without
+        decoding them first.
+        """
+        return self.blob.raw() if self.blob is not None else b""
 
 
 class Tutorial(TimestampMixin, db.Model):
+    __table_args__ = (db.Index("ix_tutorial_user_id_id", "user_id", "id"),)
+
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(db.String, nullable=False)
     input: Mapped[str] = mapped_column(db.String, nullable=False, default="")
     relevant_apis: Mapped[str] = mapped_column(db.String, nullable=False, default="")
     content: Mapped[str] = mapped_column(db.String, nullable=False, default="")
     spec_id: Mapped[int] = mapped_column(
-        db.Integer, db.ForeignKey("spec.id"), nullable=True
+        db.Integer, db.ForeignKey("spec.id"), nullable=True, index=True
     )
     user_id: Mapped[int] = mapped_column(
         db.Integer, db.ForeignKey("user.id"), nullable=False
@@ -56,3 +224,217 @@ class Tutorial(TimestampMixin, db.Model):
     server: Mapped[str] = mapped_column(
         db.String, nullable=False, default="", server_default="<infer api>"
     )
+    # Bumped by every UPDATE, for ETags: updated_at only has one-second
+    # resolution on SQLite
+    version: Mapped[int] = mapped_column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        onupdate=literal_column("version") + 1,
+    )
+
+
+class SpecIndex(TimestampMixin, db.Model):
+    """
+    Derived, versioned artifact computed from Spec.content at ingest time. Every
+    column holds a JSON document so the hot endpoints can load only the slice
+    they need instead of re-parsing the whole spec. Operations and the nodes
+    they refer to are stored per row, in SpecOperation and SpecNode.
+    """
+
+    __tablename__ = "spec_index"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    spec_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec.id"), nullable=False, unique=True
+    )
+    version: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    # Output of SpecFormatter.trim_paths_only(), serialized exactly as it is
+    # embedded into the relevant-apis prompt
+    paths: Mapped[str] = mapped_column(db.String, nullable=False)
+    # Non-empty sections of SpecFormatter.extract_security_info()
+    security: Mapped[str] = mapped_column(db.String, nullable=False)
+    # BM25 index of the operations, see restly.search.build_search_index
+    search: Mapped[str] = mapped_column(db.String, nullable=False)
+
+
+class SpecOperation(db.Model):
+    """
+    One trimmed operation of an indexed spec, with what is needed to collect
+    the nodes it refers to without walking the spec.
+    """
+
+    __tablename__ = "spec_operation"
+
+    spec_index_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec_index.id"), primary_key=True
+    )
+    path: Mapped[str] = mapped_column(db.String, primary_key=True)
+    verb: Mapped[str] = mapped_column(db.String, primary_key=True)
+    # Order of the operation in the spec, which narrowed specs keep
+    position: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    # The operation as in SpecFormatter.trim_paths_only(), as JSON
+    body: Mapped[str] = mapped_column(db.String, nullable=False)
+    # JSON list of the SpecNode.scc values of every ref the operation reaches
+    sccs: Mapped[str] = mapped_column(db.String, nullable=False)
+
+
+class SpecNode(db.Model):
+    """
+    A node reachable from the trimmed paths of an indexed spec, by $ref.
+    """
+
+    __tablename__ = "spec_node"
+    __table_args__ = (
+        db.Index("ix_spec_node_spec_index_id_scc", "spec_index_id", "scc"),
+    )
+
+    spec_index_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec_index.id"), primary_key=True
+    )
+    ref: Mapped[str] = mapped_column(db.String, primary_key=True)
+    # Strongly connected component of the ref graph. Refs that reach each other
+    # are always selected together, so operations store components rather than
+    # refs: cyclic specs would otherwise store most of the spec per operation
+    scc: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    node: Mapped[str] = mapped_column(db.String, nullable=False)
+
+
+class SpecIngestJob(TimestampMixin, db.Model):
+    """
+    Background fetch/parse/index of a spec. Jobs live in the database so that
+    queued work survives restarts; workers claim them with SKIP LOCKED.
+    """
+
+    __tablename__ = "spec_ingest_job"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    spec_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec.id"), nullable=False, index=True
+    )
+    status: Mapped[str] = mapped_column(
+        db.String, nullable=False, default=JOB_STATUS_QUEUED, index=True
+    )
+    # Last stage reached: fetching, indexing or done
+    progress: Mapped[str] = mapped_column(db.String, nullable=False, default="")
+    attempts: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(db.DateTime, nullable=True)
+
+
+class Generation(TimestampMixin, db.Model):
+    """
+    One LLM completion of a tutorial, produced independently of the request
+    that started it. Its output is logged to generation_chunk as it streams so
+    that any number of viewers can follow or resume it.
+    """
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    tutorial_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("tutorial.id"), nullable=False, index=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False
+    )
+    spec_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec.id"), nullable=False
+    )
+    input: Mapped[str] = mapped_column(db.String, nullable=False)
+    relevant_apis: Mapped[str] = mapped_column(db.String, nullable=False)
+    server: Mapped[str] = mapped_column(db.String, nullable=False)
+    status: Mapped[str] = mapped_column(
+        db.String, nullable=False, default=GENERATION_STATUS_RUNNING
+    )
+    # Number of chunks logged so far, i.e. the last event id
+    chunk_count: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+    # Bumped by the producer on every flush; a running generation that stops
+    # being bumped lost its worker
+    heartbeat_at: Mapped[datetime] = mapped_column(
+        db.DateTime, nullable=False, default=datetime.utcnow
+    )
+
+
+class GenerationChunk(db.Model):
+    __tablename__ = "generation_chunk"
+
+    generation_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("generation.id"), primary_key=True
+    )
+    # 1-based, doubles as the SSE event id
+    seq: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    content: Mapped[str] = mapped_column(db.String, nullable=False)
+
+
+class TutorialBatch(TimestampMixin, db.Model):
+    """
+    Tutorials generated together from one spec. Every item's prompt starts with
+    the same prefix (instructions and a spec slice covering all the items), so
+    that the provider can reuse its cached processing of it across items.
+    """
+
+    __tablename__ = "tutorial_batch"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False
+    )
+    spec_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("spec.id"), nullable=False
+    )
+    server: Mapped[str] = mapped_column(db.String, nullable=False)
+    prompt_prefix: Mapped[str] = mapped_column(db.String, nullable=False)
+    bypass_cache: Mapped[bool] = mapped_column(
+        db.Boolean, nullable=False, default=False
+    )
+
+
+class TutorialBatchItem(db.Model):
+    """
+    One tutorial of a batch. Items live in the database so that queued work
+    survives restarts; workers claim them with SKIP LOCKED.
+    """
+
+    __tablename__ = "tutorial_batch_item"
+
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True, autoincrement=True)
+    batch_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("tutorial_batch.id"), nullable=False, index=True
+    )
+    # Copied from the batch, for per-user concurrency limits
+    user_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False
+    )
+    tutorial_id: Mapped[int] = mapped_column(
+        db.Integer, db.ForeignKey("tutorial.id"), nullable=False
+    )
+    input: Mapped[str] = mapped_column(db.String, nullable=False)
+    relevant_apis: Mapped[str] = mapped_column(db.String, nullable=False)
+    status: Mapped[str] = mapped_column(
+        db.String, nullable=False, default=BATCH_ITEM_STATUS_QUEUED, index=True
+    )
+    generation_id: Mapped[Optional[int]] = mapped_column(
+        db.Integer, db.ForeignKey("generation.id"), nullable=True
+    )
+    error: Mapped[Optional[str]] = mapped_column(db.String, nullable=True)
+
+
+class LLMResponse(TimestampMixin, db.Model):
+    """
+    Cached completion, keyed by the SHA-256 of its request parameters (model,
+    prompt, temperature, ...). See restly.llm_cache.
+    """
+
+    __tablename__ = "llm_response"
+
+    key: Mapped[str] = mapped_column(db.String, primary_key=True)
+    model: Mapped[str] = mapped_column(db.String, nullable=False)
+    content: Mapped[str] = mapped_column(db.String, nullable=False)
+    # Size of content in bytes, counted against LLM_CACHE_MAX_BYTES
+    size: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(db.DateTime, nullable=False)
+    # Least recently used responses are evicted first
+    used_at: Mapped[datetime] = mapped_column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
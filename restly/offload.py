@@ -0,0 +1,27 @@
+import contextvars
+from typing import Callable, TypeVar
+
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:
+    gevent = None
+
+T = TypeVar("T")
+
+
+def run_cpu_bound(fn: Callable[..., T], *args) -> T:
+    """
+    Calls fn(*args) on a native thread of the gevent hub's pool when the process
+    is monkey-patched (gunicorn's gevent worker), waiting for it without
+    blocking the other greenlets; calls it directly otherwise.
+
+    The thread still needs the GIL, so this only keeps open streams flowing
+    while fn runs; it does not add throughput. fn runs with the caller's
+    context (app context included) but must not use the database session,
+    whose connection belongs to the calling greenlet.
+    """
+    if gevent is None or not monkey.is_module_patched("threading"):
+        return fn(*args)
+    context = contextvars.copy_context()
+    return gevent.get_hub().threadpool.apply(context.run, (fn, *args))
@@ -0,0 +1,78 @@
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import re
+import time
+from io import StringIO
+from uuid import uuid4
+
+from flask import Flask, current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+# Functions listed in the log line summarizing a profile
+PROFILE_LOG_TOP = 15
+
+
+def init_profiling(app: Flask):
+    """
+    Profiles requests that send an X-Profile header equal to PROFILE_TOKEN,
+    writing the stats to PROFILE_DIR (open with pstats or snakeviz) and naming
+    the file in an X-Profile-File response header. Streamed responses are
+    profiled until the stream ends. Under gevent, other greenlets running in
+    the meantime show up in the profile too.
+    """
+
+    @app.before_request
+    def start_profile():
+        token = current_app.config["PROFILE_TOKEN"]
+        header = request.headers.get("X-Profile")
+        if not token or header is None:
+            return
+        if not hmac.compare_digest(header.encode(), token.encode()):
+            return
+        profile = cProfile.Profile()
+        g.profile = profile
+        g.profile_path = _profile_path(current_app.config["PROFILE_DIR"])
+        profile.enable()
+
+    @app.after_request
+    def name_profile(response):
+        if "profile" in g:
+            response.headers["X-Profile-File"] = os.path.basename(g.profile_path)
+        return response
+
+    @app.teardown_request
+    def dump_profile(exc):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return
+        profile.disable()
+        path = g.pop("profile_path")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profile.dump_stats(path)
+        except OSError as e:
+            logger.warning("Could not write profile %s: %s", path, e)
+            return
+
+        summary = StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(
+            PROFILE_LOG_TOP
+        )
+        logger.info(
+            "Profiled %s %s to %s\n%s",
+            request.method,
+            request.path,
+            path,
+            summary.getvalue(),
+        )
+
+
+def _profile_path(directory: str) -> str:
+    route = request.url_rule.rule if request.url_rule else request.path
+    name = re.sub(r"[^A-Za-z0-9]+", "-", f"{request.method} {route}").strip("-")
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{stamp}-{name}-{uuid4().hex[:8]}.prof")
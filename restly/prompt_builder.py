@@ -0,0 +1,174 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from .metrics import timed
+from .serialization import dumps
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Keys whose values map arbitrary names (properties, paths, status codes, media
+# types...) to nodes. Their keys are names, not fields, and are never dropped:
+# a schema may well have a property called "description" or "example".
+NAME_MAPS = frozenset(
+    [
+        "callbacks",
+        "content",
+        "definitions",
+        "encoding",
+        "headers",
+        "links",
+        "mapping",
+        "parameters",
+        "paths",
+        "path_security",
+        "patternProperties",
+        "properties",
+        "requestBodies",
+        "responses",
+        "schemas",
+        "securitySchemes",
+        # From SpecFormatter.extract_security_info()
+        "security_schemes",
+        "variables",
+    ]
+)
+
+# Descriptions are cut to this many characters before being dropped altogether
+DESCRIPTION_MAX_CHARS = 200
+
+# Progressively more aggressive reductions, each applied on top of the previous
+# ones until the prompt fits
+REDUCTIONS = ["extensions", "examples", "long descriptions", "descriptions"]
+
+# Rough characters per token of JSON-heavy English, used without tiktoken
+CHARS_PER_TOKEN = 4
+
+_encodings: dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+class PromptTooLargeError(Exception):
+    """
+    Raised when a prompt does not fit its token budget even with every
+    reduction applied. The message is safe to return to the client.
+    """
+
+
+@dataclass
+class BuiltPrompt:
+    prompt: str
+    tokens: int
+    # Reductions that were needed to fit the budget
+    reductions: list[str] = field(default_factory=list)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Number of tokens text encodes to for model, counted with tiktoken when it is
+    available and estimated from its length otherwise.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def build_spec_prompt(
+    template: str, spec: dict, max_tokens: int, model: str, **fields
+) -> BuiltPrompt:
+    """
+    Renders template with the compactly serialized spec and the other fields,
+    dropping extensions, examples and descriptions from the spec as needed to
+    stay within max_tokens.
+
+    Raises PromptTooLargeError when even the most reduced spec does not fit.
+    """
+    with timed("prompt_build"):
+        return _build_spec_prompt(template, spec, max_tokens, model, fields)
+
+
+def _build_spec_prompt(
+    template: str, spec: dict, max_tokens: int, model: str, fields: dict
+) -> BuiltPrompt:
+    applied = []
+    reduced = spec
+    while True:
+        # Compact: indent=2 alone costs 20-40% more tokens on typical specs
+        prompt = template.format(spec=dumps(reduced), **fields)
+        tokens = count_tokens(prompt, model)
+        if tokens <= max_tokens:
+            return BuiltPrompt(prompt=prompt, tokens=tokens, reductions=applied)
+        if len(applied) == len(REDUCTIONS):
+            raise PromptTooLargeError(
+                f"The selected APIs need {tokens} prompt tokens, more than the "
+                f"limit of {max_tokens}; select fewer APIs"
+            )
+        applied = REDUCTIONS[: len(applied) + 1]
+        reduced = reduce_spec(spec, set(applied))
+
+
+def reduce_spec(node: Any, reductions: set[str], names: bool = False) -> Any:
+    """
+    Copy of a spec (or any node of one) without the given kinds of low-value
+    fields. The input is not modified; it is usually shared through the spec
+    cache.
+    """
+    if isinstance(node, list):
+        return [reduce_spec(item, reductions) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    result = {}
+    for key, value in node.items():
+        if not names:
+            if "extensions" in reductions and key.startswith("x-"):
+                continue
+            if "examples" in reductions and key in ("example", "examples"):
+                continue
+            if key == "description" and isinstance(value, str):
+                if "descriptions" in reductions:
+                    continue
+                if (
+                    "long descriptions" in reductions
+                    and len(value) > DESCRIPTION_MAX_CHARS
+                ):
+                    value = value[: DESCRIPTION_MAX_CHARS - 3].rstrip() + "..."
+        result[key] = reduce_spec(
+            value, reductions, names=not names and key in NAME_MAPS
+        )
+    return result
+
+
+def _encoding(model: str) -> Optional[Any]:
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        with _encodings_lock:
+            if model not in _encodings:
+                try:
+                    name = tiktoken.encoding_name_for_model(model)
+                except KeyError:
+                    # Newer than this version of tiktoken
+                    name = "cl100k_base"
+                try:
+                    encoding = tiktoken.get_encoding(name)
+                except Exception as e:
+                    # Encodings are downloaded on first use and cached on disk
+                    # (TIKTOKEN_CACHE_DIR); without them, estimate
+                    logger.warning(
+                        "Could not load tiktoken encoding %s, estimating token "
+                        "counts: %s",
+                        name,
+                        e,
+                    )
+                    encoding = None
+                _encodings[model] = encoding
+    return _encodings[model]
@@ -30,3 +30,33 @@ SERVER ENDPOINT:
 OpenAPI SPEC:
 {spec}
 """
+
+
+# Batches put everything the items share first, so that providers that cache
+# prompt prefixes only process the spec once per batch
+GENERATE_TUTORIAL_BATCH_PREFIX = """You are an experienced developer with 10+ years of experience.
+You have extensive knowledge of REST APIs and current programming practices. 
+You tasked with writing a comprehensive, step-by-step tutorial for developers on how to use of the set of APIs described in the OpenAPI Spec provided.
+Your audience consists of developers with varying levels of experience, from beginners to advanced
+You must follow these guidelines when creating the tutorial:
+- Format: The tutorial must be written in markdown format.
+- API Focus: Strictly use only the APIs listed under RELEVANT APIS, as described in the provided OpenAPI Spec. Do not use any other APIs or SDK clients.
+- Practicality: The tutorial must be written in a way that a developer can follow it and use the APIs. Offer guidance on how to prepare and use data effectively with these APIs.
+- Numbered Steps: Every step in the tutorial will be numbered for clarity and easy reference.
+- Code Snippets: When possible, steps in the tutorial will have a code snippet that demonstrates the use of the API.
+
+OpenAPI SPEC:
+{spec}
+"""
+
+
+GENERATE_TUTORIAL_BATCH_ITEM = """
+TUTORIAL DESCRIPTION:
+{query}
+
+RELEVANT APIS:
+{apis}
+
+SERVER ENDPOINT:
+{server}
+"""
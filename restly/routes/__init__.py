@@ -1,5 +1,8 @@
 from flask import Blueprint
+from .batch import batch_bp
+from .generation import generation_bp
 from .health import health_bp
+from .metrics import metrics_bp
 from .spec import spec_bp
 from .tutorial import tutorial_bp
 from .user import user_bp
@@ -7,7 +10,10 @@ from .user import user_bp
 
 routes_bp = Blueprint("routes", __name__)
 
+routes_bp.register_blueprint(batch_bp)
+routes_bp.register_blueprint(generation_bp)
 routes_bp.register_blueprint(health_bp)
+routes_bp.register_blueprint(metrics_bp)
 routes_bp.register_blueprint(spec_bp)
 routes_bp.register_blueprint(tutorial_bp)
 routes_bp.register_blueprint(user_bp)
@@ -0,0 +1,126 @@
+from typing import Optional
+
+from flask import Blueprint, current_app, jsonify
+from flask_pydantic import validate
+from pydantic import BaseModel
+from sqlalchemy.orm import load_only
+
+from ..batches import BatchLimitError, batch_progress, batch_worker_pool, submit_batch
+from ..models import (
+    GENERATION_STATUS_DONE,
+    GENERATION_STATUS_FAILED,
+    GENERATION_STATUS_RUNNING,
+    SPEC_STATUS_READY,
+    Spec,
+    TutorialBatch,
+)
+from ..prompt_builder import PromptTooLargeError
+from ..types import ApiEndpoint
+from .middleware import user_authenticated
+
+batch_bp = Blueprint("batch", __name__)
+
+
+class BatchItemRequest(BaseModel):
+    name: str
+    query: str
+    apis: list[ApiEndpoint]
+
+
+class CreateBatchRequest(BaseModel):
+    specId: int
+    server: str
+    items: list[BatchItemRequest]
+    # Ask the model again instead of replaying cached tutorials
+    bypassCache: bool = False
+
+
+class BatchItemModel(BaseModel):
+    tutorial_id: int
+    name: str
+    # queued, running, done or failed
+    status: str
+    # Follow it from /api/v1/generations/<id>/events once started
+    generation_id: Optional[int] = None
+    chunk_count: int = 0
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    id: int
+    spec_id: int
+    # running until every item is done or failed
+    status: str
+    # Number of items per status
+    counts: dict[str, int]
+    items: list[BatchItemModel]
+
+
+@batch_bp.route("/api/v1/tutorials/batches", methods=["POST"])
+@user_authenticated
+@validate()
+def create_batch(current_user, body: CreateBatchRequest):
+    max_items = current_app.config["BATCH_MAX_ITEMS"]
+    if not body.items or len(body.items) > max_items:
+        return jsonify({"error": f"A batch must have 1 to {max_items} items"}), 400
+
+    spec: Optional[Spec] = (
+        Spec.query.options(load_only(Spec.id, Spec.content_hash, Spec.status))
+        .filter_by(id=body.specId, user_id=current_user.id)
+        .first()
+    )
+    if not spec:
+        return jsonify({"error": "Spec not found"}), 404
+    if spec.status != SPEC_STATUS_READY:
+        return jsonify({"error": f"Spec is {spec.status}"}), 409
+
+    try:
+        batch = submit_batch(
+            current_user.id,
+            spec,
+            body.server,
+            [(item.name, item.query, item.apis) for item in body.items],
+            bypass_cache=body.bypassCache,
+        )
+    except BatchLimitError as e:
+        return jsonify({"error": str(e)}), 429
+    except PromptTooLargeError as e:
+        return jsonify({"error": str(e)}), 400
+
+    pool = batch_worker_pool()
+    if pool is not None:
+        pool.notify()
+    return batch_response(batch)
+
+
+@batch_bp.route("/api/v1/tutorials/batches/<int:id>", methods=["GET"])
+@user_authenticated
+@validate()
+def get_batch(current_user, id: int):
+    batch = TutorialBatch.query.filter_by(id=id, user_id=current_user.id).first()
+    if not batch:
+        return jsonify({"error": "Batch not found"}), 404
+    # Picks up items queued before this process started
+    batch_worker_pool()
+    return batch_response(batch)
+
+
+def batch_response(batch: TutorialBatch) -> BatchResponse:
+    items = [BatchItemModel(**item) for item in batch_progress(batch.id)]
+    counts = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    finished = counts.get(GENERATION_STATUS_DONE, 0) + counts.get(
+        GENERATION_STATUS_FAILED, 0
+    )
+    return BatchResponse(
+        id=batch.id,
+        spec_id=batch.spec_id,
+        status=(
+            GENERATION_STATUS_DONE
+            if finished == len(items)
+            else GENERATION_STATUS_RUNNING
+        ),
+        counts=counts,
+        items=items,
+    )
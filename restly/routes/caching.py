@@ -0,0 +1,43 @@
+from typing import Optional
+
+from flask import Response, current_app, request
+
+from ..models import hash_content
+
+# Clients may cache responses but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag over everything a response is rendered from, computed without
+    loading the response body.
+    """
+    return hash_content(":".join(str(part) for part in parts))
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """
+    Returns a 304 response when the request's If-None-Match contains etag, in
+    any of its compressed representations.
+    """
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return _not_modified_response(etag)
+
+    # Flask-Compress appends ":<encoding>" to the ETag of compressed responses
+    encodings = current_app.config.get("COMPRESS_ALGORITHM", [])
+    candidates = [etag, *(f"{etag}:{encoding}" for encoding in encodings)]
+    for candidate in candidates:
+        if if_none_match.contains(candidate):
+            # Echo the representation the client has
+            return _not_modified_response(candidate)
+    return None
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": f'"{etag}"', "Cache-Control": CACHE_CONTROL}
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status=304, headers=cache_headers(etag))
@@ -0,0 +1,91 @@
+from json import dumps
+from typing import Optional
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_pydantic import validate
+from pydantic import BaseModel
+
+from ..db import db
+from ..generations import GenerationEvent, follow_generation
+from ..models import Generation
+from .middleware import user_authenticated
+
+generation_bp = Blueprint("generation", __name__)
+
+
+class GenerationStatusResponse(BaseModel):
+    id: int
+    tutorial_id: int
+    status: str
+    # Chunks logged so far; the last event id a viewer can resume from
+    chunk_count: int
+    error: Optional[str] = None
+
+
+@generation_bp.route("/api/v1/generations/<int:id>", methods=["GET"])
+@user_authenticated
+@validate()
+def get_generation(current_user, id: int):
+    generation = Generation.query.filter_by(id=id, user_id=current_user.id).first()
+    if not generation:
+        return jsonify({"error": "Generation not found"}), 404
+    return GenerationStatusResponse(
+        id=generation.id,
+        tutorial_id=generation.tutorial_id,
+        status=generation.status,
+        chunk_count=generation.chunk_count,
+        error=generation.error,
+    )
+
+
+@generation_bp.route("/api/v1/generations/<int:id>/events", methods=["GET"])
+@user_authenticated
+def generation_events(current_user, id: int):
+    """
+    Server-sent events for a generation: one "chunk" event per chunk of content,
+    then a "done" or "error" event. Event ids are chunk numbers, so a client
+    reconnecting with Last-Event-ID (or ?last_event_id=) resumes after it.
+    """
+    generation = Generation.query.filter_by(id=id, user_id=current_user.id).first()
+    if not generation:
+        return jsonify({"error": "Generation not found"}), 404
+    db.session.close()
+
+    last_event_id = request.headers.get(
+        "Last-Event-ID", request.args.get("last_event_id", "0")
+    )
+    if not last_event_id.isdigit():
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+
+    def generate():
+        # Tells EventSource clients how soon to reconnect, in milliseconds
+        yield "retry: 1000\n\n"
+        for event in follow_generation(id, int(last_event_id)):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(event)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        # Stops nginx from buffering the stream
+        "X-Accel-Buffering": "no",
+    }
+    return Response(
+        stream_with_context(generate()),
+        headers=headers,
+        content_type="text/event-stream",
+    )
+
+
+def format_event(event: GenerationEvent) -> str:
+    if event.content is not None:
+        name, data = "chunk", event.content
+    elif event.error is None:
+        name, data = "done", dumps({"status": event.status})
+    else:
+        name, data = "error", dumps({"status": event.status, "error": event.error})
+    # Multi-line data is split over several data fields, which clients rejoin
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"id: {event.seq}\nevent: {name}\n{lines}\n"
@@ -1,5 +1,9 @@
 from flask import Blueprint
 
+from ..auth import auth_cache, invalid_token_cache
+from ..llm_cache import llm_cache_stats
+from ..spec_index import spec_cache
+
 
 health_bp = Blueprint("health", __name__)
 
@@ -7,3 +11,13 @@ health_bp = Blueprint("health", __name__)
 @health_bp.route("/")
 def health():
     return {"status": "OK"}
+
+
+@health_bp.route("/cache")
+def cache_stats():
+    return {
+        "spec_cache": spec_cache.stats(),
+        "auth_cache": auth_cache.stats(),
+        "invalid_token_cache": invalid_token_cache.stats(),
+        "llm_cache": llm_cache_stats(),
+    }
@@ -0,0 +1,64 @@
+from typing import Optional
+
+from flask import abort, request
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import select
+
+from ..db import db
+
+MAX_PAGE_SIZE = 200
+
+
+class ListQuery(BaseModel):
+    # Keyset cursor: only rows with an id greater than this are returned
+    after: Optional[int] = None
+    limit: int = Field(default=50, ge=1, le=MAX_PAGE_SIZE)
+    # Comma separated optional fields to include, e.g. "url,content"
+    fields: Optional[str] = None
+
+
+def parse_list_query() -> ListQuery:
+    # Parsed by hand: Flask-Pydantic's query conversion predates pydantic 2
+    try:
+        return ListQuery.model_validate(request.args.to_dict())
+    except ValidationError as e:
+        abort(400, description=str(e))
+
+
+def select_fields(fields: Optional[str], default: list[str], optional: dict) -> dict:
+    """
+    Resolves the requested field names ({name: column} in optional) to the
+    columns to select. Unknown fields are a 400.
+    """
+    names = (
+        default if fields is None else [field.strip() for field in fields.split(",")]
+    )
+    columns = {}
+    for name in filter(None, names):
+        if name not in optional:
+            abort(400, description=f"Unknown field: {name}")
+        columns[name] = optional[name]
+    return columns
+
+
+def fetch_page(model, columns: dict, user_id: int, query: ListQuery):
+    """
+    Fetches one page of the user's rows, selecting only the id, the name and
+    the given columns. Returns the rows as dicts and the next page's cursor.
+    """
+    statement = (
+        select(
+            model.id,
+            model.name,
+            *(column.label(name) for name, column in columns.items()),
+        )
+        .where(model.user_id == user_id)
+        .order_by(model.id)
+        .limit(query.limit)
+    )
+    if query.after is not None:
+        statement = statement.where(model.id > query.after)
+
+    rows = [row._asdict() for row in db.session.execute(statement)]
+    next_cursor = rows[-1]["id"] if len(rows) == query.limit else None
+    return rows, next_cursor
@@ -1,6 +1,6 @@
 from functools import wraps
 from flask import request, abort
-from ..models import User
+from ..auth import authenticate
 
 
 def user_authenticated(f):
@@ -14,7 +14,7 @@ def user_authenticated(f):
         if token.startswith('Bearer '):
             token = token[7:]
 
-        user = User.query.filter_by(token=token).first()
+        user = authenticate(token)
 
         if not user:
             abort(401, description="Invalid token")
@@ -1,99 +1,229 @@
-from json import dumps, loads
-from typing import Optional
+from typing import Literal, Optional
 
-import openai
-import requests
-from flask import Blueprint, Flask, jsonify
+from flask import Blueprint, Flask, Response, current_app, jsonify
 from flask_pydantic import validate
 from pydantic import BaseModel
+from sqlalchemy.orm import load_only
 
 from ..db import db
-from ..models import Spec
+from ..ingest import SpecFetchError
+from ..jobs import enqueue_ingest, ingest_spec
+from ..llm import LLMError, llm_provider
+from ..llm_cache import cached_completion, completion_key, store_completion
+from ..metrics import observe_prompt
+from ..models import SPEC_STATUS_PENDING, SPEC_STATUS_READY, Spec, SpecIngestJob
+from ..prompt_builder import count_tokens
 from ..prompts import RELEVANT_APIS_PROMPT
-from ..types import ApiEndpoint, SpecModel, SpecLiteModel
-from ..utils import SpecFormatter
+from ..serialization import dumps_bytes, loads
+from ..spec_index import rank_operations, relevant_paths
+from ..types import ApiEndpoint, SpecLiteModel
+from .caching import cache_headers, make_etag, not_modified
+from .listing import fetch_page, parse_list_query, select_fields
 from .middleware import user_authenticated
 
 
 spec_bp = Blueprint("spec", __name__)
 
 
-DEFAULT_SPEC_TITLE = "unknown"
-DEFAULT_SPEC_VERSION = "1.0.0"
+class ListSpecsResponse(BaseModel):
+    specs: list[SpecLiteModel]
+    next_cursor: Optional[int] = None
 
 
-class ListSpecsResponse(BaseModel):
-    specs: list[SpecModel]
+LIST_SPECS_DEFAULT_FIELDS = ["url", "status"]
+LIST_SPECS_OPTIONAL_FIELDS = {
+    "url": Spec.url,
+    "status": Spec.status,
+    "created_at": Spec.created_at,
+    "updated_at": Spec.updated_at,
+}
 
 
 @spec_bp.route("/api/v1/specs", methods=["GET"])
 @user_authenticated
-@validate()
+@validate(exclude_none=True)
 def list_specs(current_user):
-    specs = Spec.query.filter_by(user_id=current_user.id).all()
-    models = [
-        SpecModel(id=spec.id, name=spec.name, url=spec.url, content=spec.content)
-        for spec in specs
-    ]
-    return ListSpecsResponse(specs=models)
-
-
-class GetSpecResponse(BaseModel):
-    spec: SpecModel
+    query = parse_list_query()
+    columns = select_fields(
+        query.fields, LIST_SPECS_DEFAULT_FIELDS, LIST_SPECS_OPTIONAL_FIELDS
+    )
+    rows, next_cursor = fetch_page(Spec, columns, current_user.id, query)
+    return ListSpecsResponse(
+        specs=[SpecLiteModel(**row) for row in rows], next_cursor=next_cursor
+    )
 
 
 @spec_bp.route("/api/v1/specs/<int:id>", methods=["GET"])
 @user_authenticated
 @validate()
 def get_spec(current_user, id: int):
+    # The content blob is only loaded if the client's copy is stale
     spec: Optional[Spec] = Spec.query.filter_by(id=id, user_id=current_user.id).first()
     if not spec:
-        jsonify({"error": "Spec not found"}), 404
-    model = SpecModel(id=spec.id, name=spec.name, url=spec.url, content=spec.content)
-    return GetSpecResponse(spec=model)
+        return jsonify({"error": "Spec not found"}), 404
+
+    etag = make_etag(spec.id, spec.content_hash, spec.status, spec.name, spec.url)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    # Serialized directly: validating a model around a multi-megabyte content
+    # string and encoding it through pydantic costs more than the query
+    body = {
+        "spec": {
+            "id": spec.id,
+            "name": spec.name,
+            "url": spec.url,
+            "content": spec.content,
+            "status": spec.status,
+        }
+    }
+    return json_response(dumps_bytes(body), cache_headers(etag))
+
+
+@spec_bp.route("/api/v1/specs/<int:id>/content", methods=["GET"])
+@user_authenticated
+@validate()
+def get_spec_content(current_user, id: int):
+    """
+    The spec itself as canonical JSON, sent as stored without parsing or
+    re-encoding it.
+    """
+    spec: Optional[Spec] = (
+        Spec.query.options(load_only(Spec.id, Spec.content_hash, Spec.status))
+        .filter_by(id=id, user_id=current_user.id)
+        .first()
+    )
+    if not spec:
+        return jsonify({"error": "Spec not found"}), 404
+    if spec.content_hash is None:
+        return jsonify({"error": f"Spec is {spec.status}"}), 409
+
+    # The content hash is already a strong validator of the body
+    response = not_modified(spec.content_hash)
+    if response is not None:
+        return response
+    return json_response(spec.raw_content, cache_headers(spec.content_hash))
 
 
 class CreateSpecRequest(BaseModel):
     url: str
+    # Return immediately with status=pending and ingest in a worker
+    background: bool = False
 
 
 class CreateSpecResponse(BaseModel):
     id: int
     name: str
-    spec: dict  # TODO: define spec model https://swagger.io/specification/
+    status: str
+    # TODO: define spec model https://swagger.io/specification/
+    spec: Optional[dict] = None
 
 
 @spec_bp.route("/api/v1/specs", methods=["POST"])
 @user_authenticated
 @validate()
 def create_spec(current_user, body: CreateSpecRequest):
-    content = requests.get(body.url).json()
-
-    spec_info = content.get("info", {})
-    spec_title = spec_info.get("title", DEFAULT_SPEC_TITLE)
-    spec_version = spec_info.get("version", DEFAULT_SPEC_VERSION)
-    name = f"{spec_title} - {spec_version}"
-
-    spec = Spec(
-        name=name,
-        url=body.url,
-        content=dumps(content),
-        user_id=current_user.id,
-    )
+    if body.background:
+        spec = Spec(
+            name=body.url,
+            url=body.url,
+            status=SPEC_STATUS_PENDING,
+            user_id=current_user.id,
+        )
+        db.session.add(spec)
+        db.session.flush()
+        enqueue_ingest(spec)
+        return CreateSpecResponse(id=spec.id, name=spec.name, status=spec.status)
+
+    spec = Spec(url=body.url, user_id=current_user.id)
+    try:
+        fetched = ingest_spec(spec)
+    except SpecFetchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # CreateSpecResponse with the stored serialization of the spec spliced in,
+    # rather than validating and encoding the parsed spec again
+    head = dumps_bytes({"id": spec.id, "name": spec.name, "status": spec.status})
+    body = b"".join([head[:-1], b',"spec":', fetched.raw.encode("utf-8"), head[-1:]])
+    return json_response(body)
+
+
+class SpecStatusResponse(BaseModel):
+    id: int
+    status: str
+    progress: str
+    attempts: int
+    error: Optional[str] = None
+
 
-    db.session.add(spec)
-    db.session.commit()
+@spec_bp.route("/api/v1/specs/<int:id>/status", methods=["GET"])
+@user_authenticated
+@validate()
+def get_spec_status(current_user, id: int):
+    spec = (
+        Spec.query.options(load_only(Spec.id, Spec.status, Spec.error))
+        .filter_by(id=id, user_id=current_user.id)
+        .first()
+    )
+    if not spec:
+        return jsonify({"error": "Spec not found"}), 404
 
-    return CreateSpecResponse(
+    job = (
+        SpecIngestJob.query.filter_by(spec_id=spec.id)
+        .order_by(SpecIngestJob.id.desc())
+        .first()
+    )
+    return SpecStatusResponse(
         id=spec.id,
-        name=spec.name,
-        spec=content,
+        status=spec.status,
+        progress=job.progress if job else "done",
+        attempts=job.attempts if job else 1,
+        error=spec.error,
+    )
+
+
+class RefreshSpecRequest(BaseModel):
+    background: bool = False
+
+
+class RefreshSpecResponse(BaseModel):
+    id: int
+    status: str
+    # Unknown until a background refresh completes
+    changed: Optional[bool] = None
+
+
+@spec_bp.route("/api/v1/specs/<int:id>/refresh", methods=["POST"])
+@user_authenticated
+@validate()
+def refresh_spec(current_user, id: int, body: RefreshSpecRequest):
+    spec = Spec.query.filter_by(id=id, user_id=current_user.id).first()
+    if not spec:
+        return jsonify({"error": "Spec not found"}), 404
+
+    if body.background or spec.status == SPEC_STATUS_PENDING:
+        enqueue_ingest(spec)
+        return RefreshSpecResponse(id=spec.id, status=spec.status)
+
+    try:
+        fetched = ingest_spec(spec)
+    except SpecFetchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return RefreshSpecResponse(
+        id=spec.id, status=spec.status, changed=fetched is not None
     )
 
 
 class RelevantApisRequest(BaseModel):
     query: str
     count: int = 10
+    # "llm" has the model choose among the best keyword matches; "local"
+    # returns the keyword matches themselves, without calling the model
+    mode: Literal["llm", "local"] = "llm"
+    # Ask the model again instead of returning a cached answer
+    bypassCache: bool = False
 
 
 class RelevantApisResponse(BaseModel):
@@ -104,21 +234,53 @@ class RelevantApisResponse(BaseModel):
 @user_authenticated
 @validate()
 def relevant_apis(current_user, id: int, body: RelevantApisRequest):
-    spec = Spec.query.filter_by(id=id, user_id=current_user.id).first()
+    spec = (
+        Spec.query.options(load_only(Spec.id, Spec.content_hash, Spec.status))
+        .filter_by(id=id, user_id=current_user.id)
+        .first()
+    )
     if not spec:
-        jsonify({"error": "Spec not found"}), 404
+        return jsonify({"error": "Spec not found"}), 404
+    if spec.status != SPEC_STATUS_READY:
+        return jsonify({"error": f"Spec is {spec.status}"}), 409
 
-    spec_content = loads(spec.content)
-    trimmed_spec = SpecFormatter(spec_content).trim_paths_only()
-    trimmed_spec_str = dumps(trimmed_spec)
+    if body.mode == "local":
+        apis = [api for api, _ in rank_operations(spec, body.query, body.count)]
+        return RelevantApisResponse(apis=apis)
+
+    candidates = current_app.config["RELEVANT_APIS_CANDIDATES"]
+    if candidates > 0:
+        # Leave the model something to choose from
+        candidates = max(candidates, body.count)
+    trimmed_spec_str = relevant_paths(spec, body.query, candidates)
 
     prompt = RELEVANT_APIS_PROMPT.format(query=body.query, spec=trimmed_spec_str, count=body.count)
-    client = openai.OpenAI()
-    completion = client.chat.completions.create(
-        model="gpt-4-1106-preview",
-        response_format={"type": "json_object"},
-        messages=[{"role": "user", "content": prompt}],
+
+    provider = llm_provider()
+    key = completion_key(
+        provider=provider.name,
+        model=provider.model,
+        prompt=prompt,
+        json_response=True,
         temperature=0,
     )
-    resp = loads(completion.choices[0].message.content)
-    return RelevantApisResponse(**resp)
+    content = None if body.bypassCache else cached_completion(key)
+    if content is not None:
+        return RelevantApisResponse(**loads(content))
+
+    observe_prompt("relevant_apis", prompt, count_tokens(prompt, provider.model))
+    # Don't hold a database connection while waiting on the model
+    db.session.close()
+    try:
+        content = provider.complete(prompt, json_response=True)
+    except LLMError as e:
+        return jsonify({"error": str(e)}), 503
+    resp = loads(content)
+    response = RelevantApisResponse(**resp)
+    # Only answers that parsed are worth replaying
+    store_completion(key, provider.model, content)
+    return response
+
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    return Response(body, mimetype="application/json", headers=headers)
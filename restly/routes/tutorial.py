@@ -1,41 +1,61 @@
-from json import dumps, loads
+from json import loads
 from typing import Optional
 
-import openai
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify
 from flask_pydantic import validate
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
 
 from ..db import db
-from ..models import Spec, Tutorial
+from ..generations import follow_generation, running_generation, start_generation
+from ..llm import llm_provider
+from ..models import SPEC_STATUS_READY, Spec, Tutorial
+from ..metrics import observe_prompt
+from ..prompt_builder import BuiltPrompt, PromptTooLargeError, build_spec_prompt
 from ..prompts import GENERATE_TUTORIAL_PROMPT
+from ..spec_index import spec_slice
 from ..types import ApiEndpoint, ApiEndpointList, TutorialModel, TutorialLiteModel
-from ..utils import SpecFormatter
 import logging
 
 from flask import Response, stream_with_context
-from openai.types.chat import ChatCompletionChunk
-from openai._streaming import Stream
+from .caching import cache_headers, make_etag, not_modified
+from .listing import fetch_page, parse_list_query, select_fields
 from .middleware import user_authenticated
 
-
 tutorial_bp = Blueprint("tutorial", __name__)
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
 class ListTutorialsResponse(BaseModel):
     tutorials: list[TutorialLiteModel]
+    next_cursor: Optional[int] = None
+
+
+LIST_TUTORIALS_DEFAULT_FIELDS = []
+LIST_TUTORIALS_OPTIONAL_FIELDS = {
+    "spec_id": Tutorial.spec_id,
+    "query": Tutorial.input,
+    "server": Tutorial.server,
+    "content": Tutorial.content,
+    "created_at": Tutorial.created_at,
+    "updated_at": Tutorial.updated_at,
+}
 
 
 @tutorial_bp.route("/api/v1/tutorials", methods=["GET"])
 @user_authenticated
-@validate()
+@validate(exclude_none=True)
 def list_tutorials(current_user):
-    tutorials = Tutorial.query.filter_by(user_id=current_user.id).all()
-    models = [
-        TutorialLiteModel(id=tutorial.id, name=tutorial.name) for tutorial in tutorials
-    ]
-    return ListTutorialsResponse(tutorials=models)
+    query = parse_list_query()
+    columns = select_fields(
+        query.fields, LIST_TUTORIALS_DEFAULT_FIELDS, LIST_TUTORIALS_OPTIONAL_FIELDS
+    )
+    rows, next_cursor = fetch_page(Tutorial, columns, current_user.id, query)
+    return ListTutorialsResponse(
+        tutorials=[TutorialLiteModel(**row) for row in rows], next_cursor=next_cursor
+    )
 
 
 class GetTutorialResponse(BaseModel):
@@ -46,9 +66,29 @@ class GetTutorialResponse(BaseModel):
 @user_authenticated
 @validate()
 def get_tutorial(current_user, id: int):
-    tutorial = Tutorial.query.filter_by(id=id, user_id=current_user.id).first()
+    # content is deferred so that a 304 never loads it
+    tutorial = (
+        Tutorial.query.filter_by(id=id, user_id=current_user.id)
+        .options(
+            load_only(
+                Tutorial.id,
+                Tutorial.name,
+                Tutorial.input,
+                Tutorial.relevant_apis,
+                Tutorial.spec_id,
+                Tutorial.version,
+            )
+        )
+        .first()
+    )
     if not tutorial:
         return jsonify({"error": "Tutorial not found"}), 404
+
+    etag = make_etag(tutorial.id, tutorial.version)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
     model = TutorialModel(
         id=tutorial.id,
         name=tutorial.name,
@@ -58,7 +98,7 @@ def get_tutorial(current_user, id: int):
         spec_id=tutorial.spec_id,
     )
 
-    return GetTutorialResponse(tutorial=model)
+    return GetTutorialResponse(tutorial=model), cache_headers(etag)
 
 
 class CreateTutorialRequest(BaseModel):
@@ -84,6 +124,8 @@ class GenerateTutorialRequest(BaseModel):
     query: str
     apis: list[ApiEndpoint]
     server: str
+    # Ask the model again instead of replaying a cached tutorial
+    bypassCache: bool = False
 
 
 class GenerateTutorialResponse(BaseModel):
@@ -95,51 +137,80 @@ class GenerateTutorialResponse(BaseModel):
 @user_authenticated
 @validate()
 def generate_tutorial_content(current_user, id: int, body: GenerateTutorialRequest):
-    spec: Optional[Spec] = Spec.query.filter_by(
-        id=body.specId, user_id=current_user.id
-    ).first()
+    spec: Optional[Spec] = (
+        Spec.query.options(load_only(Spec.id, Spec.content_hash, Spec.status))
+        .filter_by(id=body.specId, user_id=current_user.id)
+        .first()
+    )
     if not spec:
         return jsonify({"error": "Spec not found"}), 404
+    if spec.status != SPEC_STATUS_READY:
+        return jsonify({"error": f"Spec is {spec.status}"}), 409
 
     tutorial = Tutorial.query.filter_by(id=id, user_id=current_user.id).first()
     if not tutorial:
         return jsonify({"error": "Tutorial not found"}), 404
 
-    def on_completion(content_aggregated):
-        tutorial.content = content_aggregated
-        tutorial.input = body.query
-        tutorial.relevant_apis = relevant_apis
-        tutorial.spec_id = spec.id
-        tutorial.server = body.server
-
-        db.session.add(tutorial)
-        db.session.commit()
+    relevant_apis = ApiEndpointList(apis=body.apis).model_dump_json()
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+    }
 
-    # Streams the response
-    completion = generate_content(
-        loads(spec.content), body.query, body.apis, body.server
+    generation = running_generation(tutorial.id)
+    if generation is None:
+        # Built before locking, since a lazy index rebuild commits
+        try:
+            prompt = tutorial_prompt(spec, body.query, body.apis, body.server)
+        except PromptTooLargeError as e:
+            return jsonify({"error": str(e)}), 400
+        # Concurrent requests would each start a generation: lock the tutorial
+        # until this one's is recorded (start_generation commits), and let
+        # whoever waited on the lock find it
+        db.session.execute(
+            select(Tutorial.id).where(Tutorial.id == tutorial.id).with_for_update()
+        )
+        generation = running_generation(tutorial.id)
+        if generation is None:
+            headers["X-Prompt-Tokens"] = str(prompt.tokens)
+            generation = start_generation(
+                tutorial,
+                spec.id,
+                body.query,
+                relevant_apis,
+                body.server,
+                prompt.prompt,
+                bypass_cache=body.bypassCache,
+            )
+
+    # Attach to an in-flight generation rather than paying for another
+    same_input = (
+        generation.spec_id == spec.id
+        and generation.input == body.query
+        and generation.relevant_apis == relevant_apis
+        and generation.server == body.server
     )
+    if not same_input:
+        return jsonify({"error": "Tutorial is already being generated"}), 409
+    generation_id = generation.id
 
-    def generate():
-        content_aggregated = ""
-        try:
-            for chunk in completion:
-                for choice in chunk.choices:
-                    content = choice.delta.content
-                    if content is not None:
-                        content_aggregated += content
-                        yield content
-        finally:
-            on_completion(content_aggregated)
+    # Hand the connection back to the pool while the completion streams, which
+    # can take minutes
+    db.session.close()
 
-    relevant_apis = ApiEndpointList(apis=body.apis).model_dump_json()
+    def generate():
+        # The generation carries on if the client goes away; it can be resumed
+        # from /api/v1/generations/<id>/events
+        for event in follow_generation(generation_id):
+            if event is not None and event.content is not None:
+                yield event.content
 
     # return GenerateTutorialResponse(
     #     id=tutorial.id,
     #     content=content,
     # )
 
-    headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    headers["X-Generation-Id"] = str(generation_id)
     return Response(
         stream_with_context(generate()), headers=headers, content_type="text/plain"
     )
@@ -169,33 +240,21 @@ def update_tutorial_content(current_user, id: int, body: UpdateTutorialContentRe
     return UpdateTutorialContentResponse(id=tutorial.id)
 
 
-def generate_content(
-    spec: dict, query: str, apis: list[ApiEndpoint], server: str
-) -> Stream[ChatCompletionChunk]:
-    trimmed_spec = SpecFormatter(spec).narrow_api_list(apis)
-
-    included_refs = SpecFormatter(spec).collect_refs(trimmed_spec)
-    ref_tree = SpecFormatter(spec).select_nodes(included_refs)
-    security_schemes = {
-        key: value
-        for key, value in SpecFormatter(spec).extract_security_info().items()
-        if value
-    }
-
-    final_spec = {**trimmed_spec, **ref_tree, **security_schemes}
-    final_spec_str = dumps(final_spec, indent=2)
-    prompt = GENERATE_TUTORIAL_PROMPT.format(
-        query=query, spec=final_spec_str, server=server
+def tutorial_prompt(
+    spec: Spec, query: str, apis: list[ApiEndpoint], server: str
+) -> BuiltPrompt:
+    built = build_spec_prompt(
+        GENERATE_TUTORIAL_PROMPT,
+        spec_slice(spec, apis),
+        max_tokens=current_app.config["TUTORIAL_PROMPT_MAX_TOKENS"],
+        model=llm_provider().model,
+        query=query,
+        server=server,
     )
-
-    # logging.info("Prompt for genning tutorial %s", prompt)
-
-    client = openai.OpenAI()
-
-    completion = client.chat.completions.create(
-        model="gpt-4-1106-preview",
-        messages=[{"role": "user", "content": prompt}],
-        stream=True,
-        temperature=0,
+    observe_prompt("tutorial", built.prompt, built.tokens)
+    logger.info(
+        "Tutorial prompt: %s tokens, reduced by %s",
+        built.tokens,
+        ", ".join(built.reductions) or "nothing",
     )
-    return completion
+    return built
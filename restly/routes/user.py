@@ -3,8 +3,10 @@ from flask_pydantic import validate
 from pydantic import BaseModel
 from typing import Optional
 
+from ..auth import invalidate_token
 from ..db import db
 from ..models import User
+from .middleware import user_authenticated
 
 user_bp = Blueprint("user", __name__)
 
@@ -18,6 +20,21 @@ class CreateUserResponse(BaseModel):
 @validate()
 def create_user(body: CreateUserRequest):
     user = User(email=body.email)
+    token = user.issue_token()
     db.session.add(user)
     db.session.commit()
-    return CreateUserResponse(token=user.token)
+    return CreateUserResponse(token=token)
+
+class RotateTokenResponse(BaseModel):
+    token: str
+
+@user_bp.route("/api/v1/users/token", methods=["POST"])
+@user_authenticated
+@validate()
+def rotate_token(current_user):
+    user = db.session.get(User, current_user.id)
+    old_token_hash = user.token_hash
+    token = user.issue_token()
+    db.session.commit()
+    invalidate_token(old_token_hash)
+    return RotateTokenResponse(token=token)
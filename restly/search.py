@@ -0,0 +1,145 @@
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+from .types import ApiEndpoint
+from .utils import HTTP_METHODS, SpecFormatter
+
+# Splits camelCase, snake_case and path segments: "/users/{userId}" -> users, user, id
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it me my of on or "
+    "the this to use using want what when which with".split()
+)
+
+# Words a query is likely to use for what an HTTP method does, indexed with
+# every operation of that method
+VERB_TERMS = {
+    "get": "get list find fetch retrieve read search",
+    "put": "put update replace",
+    "post": "post create add new send",
+    "delete": "delete remove",
+    "patch": "patch update modify",
+}
+
+# Terms in the path, summary and operationId say more about an operation than
+# ones buried in its description, so they are counted this many times
+STRONG_FIELD_WEIGHT = 2
+
+# BM25 parameters, the usual defaults
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if word in STOP_WORDS:
+            continue
+        # Crude plural folding, applied to queries and documents alike
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def build_search_index(formatter: SpecFormatter, content: dict) -> dict:
+    """
+    Inverted index of the spec's operations over their method, path, summary,
+    operationId, description, tags and parameter names:
+
+        {"operations": [[path, verb], ...], "lengths": [...],
+         "postings": {term: [[operation, term frequency], ...]}}
+    """
+    operations = []
+    lengths = []
+    postings: dict[str, list[list[int]]] = {}
+
+    paths = content.get("paths")
+    for path, path_item in (paths if isinstance(paths, dict) else {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        shared_parameters = path_item.get("parameters") or []
+        for verb, operation in path_item.items():
+            if verb not in HTTP_METHODS or not isinstance(operation, dict):
+                continue
+            strong = [path, operation.get("summary"), operation.get("operationId")]
+            weak = [
+                VERB_TERMS.get(verb, verb),
+                operation.get("description"),
+                *(operation.get("tags") or []),
+            ]
+            for parameter in [*shared_parameters, *(operation.get("parameters") or [])]:
+                weak.append(_parameter_name(formatter, parameter))
+
+            terms = Counter()
+            for text in strong:
+                if isinstance(text, str):
+                    for term in tokenize(text):
+                        terms[term] += STRONG_FIELD_WEIGHT
+            for text in weak:
+                if isinstance(text, str):
+                    terms.update(tokenize(text))
+
+            number = len(operations)
+            operations.append([path, verb])
+            lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append([number, frequency])
+
+    return {"operations": operations, "lengths": lengths, "postings": postings}
+
+
+def search_operations(
+    index: dict, query: str, limit: int
+) -> list[tuple[ApiEndpoint, float]]:
+    """
+    The limit best BM25 matches for query, best first. Operations sharing no
+    term with the query are left out.
+    """
+    lengths = index["lengths"]
+    if not lengths:
+        return []
+    average_length = sum(lengths) / len(lengths) or 1
+
+    scores: dict[int, float] = {}
+    for term in set(tokenize(query)):
+        matches = index["postings"].get(term)
+        if not matches:
+            continue
+        idf = math.log(1 + (len(lengths) - len(matches) + 0.5) / (len(matches) + 0.5))
+        for number, frequency in matches:
+            norm = K1 * (1 - B + B * lengths[number] / average_length)
+            scores[number] = scores.get(number, 0.0) + idf * frequency * (K1 + 1) / (
+                frequency + norm
+            )
+
+    # Ties keep spec order
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [
+        (
+            ApiEndpoint(
+                path=index["operations"][number][0],
+                verb=index["operations"][number][1].upper(),
+            ),
+            score,
+        )
+        for number, score in best
+    ]
+
+
+def _parameter_name(formatter: SpecFormatter, parameter) -> Optional[str]:
+    if not isinstance(parameter, dict):
+        return None
+    if "$ref" in parameter:
+        try:
+            parameter = formatter.resolve_ref(parameter["$ref"])
+        except (KeyError, NotImplementedError):
+            # Dangling or external ref: only costs the parameter's name
+            return None
+        if not isinstance(parameter, dict):
+            return None
+    return parameter.get("name")
@@ -0,0 +1,43 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Spec content is parsed and serialized with orjson when it is installed, which
+# is several times faster than the json module on multi-megabyte specs. Both
+# backends produce the same documents, but not always byte for byte (floats in
+# exponent notation, NaN), so nothing hashed across deployments should go
+# through here: see FetchedSpec.raw.
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    Parses a JSON document. Raises json.JSONDecodeError (which orjson's error
+    subclasses) on invalid input.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """
+    Serializes value compactly: no indentation or spaces after separators, and
+    non-ASCII characters left unescaped.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """
+    dumps() encoded as UTF-8, as sent in responses. orjson produces the bytes
+    directly, without an intermediate str.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return dumps(value).encode("utf-8")
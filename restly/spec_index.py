@@ -0,0 +1,421 @@
+import functools
+import logging
+from typing import Any, Callable, Optional
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import load_only
+
+from .cache import LRUCache
+from .db import db
+from .metrics import timed, timed_call
+from .models import Spec, SpecIndex, SpecNode, SpecOperation
+from .offload import run_cpu_bound
+from .search import build_search_index, search_operations
+from .serialization import dumps, loads
+from .types import ApiEndpoint
+from .utils import SpecFormatter
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the shape of the derived artifact changes. Rows built with an
+# older version are rebuilt lazily on first access.
+SPEC_INDEX_VERSION = 5
+
+# Parsed index slices and SpecFormatter results, keyed by content hash. The
+# budget is set from SPEC_CACHE_MAX_BYTES in create_app.
+spec_cache = LRUCache(max_bytes=0)
+
+# Bound on the values of one IN clause, well under SQLite's parameter limit
+IN_CLAUSE_BATCH_SIZE = 500
+
+
+def build_spec_index(
+    spec_id: int, content: dict
+) -> tuple[SpecIndex, list[dict], list[dict]]:
+    """
+    Computes the derived artifact for a parsed spec, along with its spec_operation
+    and spec_node rows (without spec_index_id). Only refs reachable from the
+    trimmed paths are indexed, since nothing else ever ends up in a prompt.
+    """
+    formatter = SpecFormatter(content)
+    with timed("index_trim_paths"):
+        trimmed_spec = formatter.trim_paths_only() or {"paths": {}}
+
+    with timed("index_ref_graph"):
+        ref_graph = formatter.ref_graph(trimmed_spec)
+    with timed("index_components"):
+        operations, nodes = _index_components(formatter, trimmed_spec, ref_graph)
+    if formatter.unresolved_refs:
+        # Indexed without them, as if the refs were not there
+        logger.warning(
+            "Spec %s has %d refs that cannot be resolved, e.g. %s",
+            spec_id,
+            len(formatter.unresolved_refs),
+            min(formatter.unresolved_refs),
+        )
+
+    security = {
+        key: value for key, value in formatter.extract_security_info().items() if value
+    }
+    with timed("index_search"):
+        search = build_search_index(formatter, content)
+
+    index = SpecIndex(
+        spec_id=spec_id,
+        version=SPEC_INDEX_VERSION,
+        paths=dumps(trimmed_spec),
+        security=dumps(security),
+        search=dumps(search),
+    )
+    return index, operations, nodes
+
+
+def _index_components(
+    formatter: SpecFormatter, trimmed_spec: dict, ref_graph: dict[str, list[str]]
+) -> tuple[list[dict], list[dict]]:
+    # spec_operation and spec_node rows of build_spec_index
+    scc_of = strongly_connected_components(ref_graph)
+    scc_edges: dict[int, set[int]] = {}
+    for ref, edges in ref_graph.items():
+        scc_edges.setdefault(scc_of[ref], set()).update(scc_of[edge] for edge in edges)
+
+    nodes = [
+        {"ref": ref, "scc": scc_of[ref], "node": dumps(formatter.resolve_ref(ref))}
+        for ref in ref_graph
+    ]
+
+    operations = []
+    for path, path_item in trimmed_spec["paths"].items():
+        for verb, operation in path_item.items():
+            # Components reachable from the operation, through the condensed
+            # (acyclic) graph
+            queue = [
+                scc_of[ref]
+                for ref in SpecFormatter._collect_refs_from_node(operation)
+                if ref in scc_of
+            ]
+            sccs = set()
+            while queue:
+                scc = queue.pop()
+                if scc not in sccs:
+                    sccs.add(scc)
+                    queue.extend(scc_edges.get(scc, ()))
+            operations.append(
+                {
+                    "path": path,
+                    "verb": verb,
+                    "position": len(operations),
+                    "body": dumps(operation),
+                    "sccs": dumps(sorted(sccs)),
+                }
+            )
+
+    return operations, nodes
+
+
+def strongly_connected_components(graph: dict[str, list[str]]) -> dict[str, int]:
+    """
+    Numbers the strongly connected components of a graph given as adjacency
+    lists (Tarjan's algorithm, iteratively, since ref chains can be thousands of
+    refs deep). Returns each vertex's component.
+    """
+    counter = components = 0
+    order: dict[str, int] = {}
+    low: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    result: dict[str, int] = {}
+
+    for root in graph:
+        if root in order:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph.get(root, ())))]
+        while work:
+            vertex, edges = work[-1]
+            for edge in edges:
+                if edge not in order:
+                    order[edge] = low[edge] = counter
+                    counter += 1
+                    stack.append(edge)
+                    on_stack.add(edge)
+                    work.append((edge, iter(graph.get(edge, ()))))
+                    break
+                if edge in on_stack:
+                    low[vertex] = min(low[vertex], order[edge])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[vertex])
+                if low[vertex] == order[vertex]:
+                    # vertex is the root of a component: pop its members
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        result[member] = components
+                        if member == vertex:
+                            break
+                    components += 1
+    return result
+
+
+def refresh_spec_index(spec: Spec, content: Optional[dict] = None) -> SpecIndex:
+    """
+    Rebuilds and stores the index for a spec, replacing any previous version.
+    """
+    with timed("spec_index_build"):
+        return _refresh_spec_index(spec, content)
+
+
+def _refresh_spec_index(spec: Spec, content: Optional[dict]) -> SpecIndex:
+    if content is None:
+        content = run_cpu_bound(loads, spec.raw_content)
+    previous = select(SpecIndex.id).where(SpecIndex.spec_id == spec.id)
+    db.session.execute(
+        delete(SpecOperation).where(SpecOperation.spec_index_id.in_(previous))
+    )
+    db.session.execute(delete(SpecNode).where(SpecNode.spec_index_id.in_(previous)))
+    SpecIndex.query.filter_by(spec_id=spec.id).delete()
+
+    index, operations, nodes = run_cpu_bound(build_spec_index, spec.id, content)
+    db.session.add(index)
+    db.session.flush()
+    if operations:
+        db.session.execute(
+            insert(SpecOperation),
+            [{"spec_index_id": index.id, **operation} for operation in operations],
+        )
+    if nodes:
+        db.session.execute(
+            insert(SpecNode), [{"spec_index_id": index.id, **node} for node in nodes]
+        )
+    db.session.commit()
+    return index
+
+
+def get_spec_index(spec: Spec, *columns) -> SpecIndex:
+    """
+    Loads the index for a spec, restricted to the given columns. Specs created
+    before the index existed (or with a stale version) are indexed on demand.
+    """
+    query = SpecIndex.query.filter_by(spec_id=spec.id, version=SPEC_INDEX_VERSION)
+    if columns:
+        query = query.options(load_only(*columns))
+    with timed("index_fetch"):
+        index = query.first()
+    if index is None:
+        # Concurrent rebuilds of one spec (e.g. right after a version bump)
+        # would collide on spec_index.spec_id: lock the spec, and let whoever
+        # waited on the lock find the index built by the first
+        db.session.execute(select(Spec.id).where(Spec.id == spec.id).with_for_update())
+        index = query.first()
+        if index is None:
+            index = refresh_spec_index(spec)
+        else:
+            # Releases the lock
+            db.session.commit()
+    return index
+
+
+def trimmed_paths(spec: Spec) -> str:
+    """
+    Serialized SpecFormatter.trim_paths_only() output, ready for the prompt.
+    """
+    return _cached(
+        spec, "trim_paths_only", lambda: get_spec_index(spec, SpecIndex.paths).paths
+    )
+
+
+def relevant_paths(spec: Spec, query: str, candidates: int) -> str:
+    """
+    Serialized trimmed paths of the operations that best match query, for the
+    relevant-apis prompt. Specs with at most `candidates` operations are sent
+    whole; larger ones are cut down to the top keyword matches, topped up in
+    spec order when too few operations match.
+    """
+    index = _load_slice(spec, SpecIndex.search)
+    if candidates <= 0 or len(index["operations"]) <= candidates:
+        return trimmed_paths(spec)
+
+    apis = [api for api, _ in search_operations(index, query, candidates)]
+    if len(apis) < candidates:
+        selected = {(api.path, api.verb.lower()) for api in apis}
+        for path, verb in index["operations"]:
+            if len(apis) == candidates:
+                break
+            if (path, verb) not in selected:
+                apis.append(ApiEndpoint(path=path, verb=verb.upper()))
+    return dumps(narrow_api_list(spec, apis))
+
+
+def rank_operations(
+    spec: Spec, query: str, limit: int
+) -> list[tuple[ApiEndpoint, float]]:
+    """
+    The spec's best keyword matches for query with their BM25 scores, without
+    involving the model.
+    """
+    return search_operations(_load_slice(spec, SpecIndex.search), query, limit)
+
+
+def narrow_api_list(spec: Spec, apis: list[ApiEndpoint]) -> dict:
+    """
+    Same as SpecFormatter.narrow_api_list, assembled from the stored operations
+    of the given APIs alone. Paths none of whose requested operations exist are
+    left out rather than kept empty.
+    """
+    return _narrow_api_list(spec, apis, _index_loader(spec, SpecIndex.id))
+
+
+def select_nodes(spec: Spec, apis: list[ApiEndpoint]) -> dict:
+    """
+    Same as SpecFormatter.select_nodes over the ref closure of the given
+    operations, loading only the nodes in that closure.
+    """
+    return _select_nodes(spec, apis, _index_loader(spec, SpecIndex.id))
+
+
+def extract_security_info(spec: Spec) -> dict:
+    return _load_slice(spec, SpecIndex.security)
+
+
+def spec_slice(spec: Spec, apis: list[ApiEndpoint]) -> dict:
+    """
+    narrow_api_list, select_nodes and extract_security_info merged, as tutorial
+    prompts send them. Whatever is not cached is loaded with a single lookup of
+    the index and a single fetch of the operations.
+    """
+    index = _index_loader(spec, SpecIndex.id, SpecIndex.security)
+    return {
+        **_narrow_api_list(spec, apis, index),
+        **_select_nodes(spec, apis, index),
+        **_load_slice(spec, SpecIndex.security, index),
+    }
+
+
+def _narrow_api_list(
+    spec: Spec, apis: list[ApiEndpoint], index: Callable[[], SpecIndex]
+) -> dict:
+    # Not cached itself: the operations it is built from are
+    paths = {}
+    for path, verb, body, _ in _operations(spec, apis, index):
+        paths.setdefault(path, {})[verb] = body
+    return {"paths": paths}
+
+
+def _select_nodes(
+    spec: Spec, apis: list[ApiEndpoint], index: Callable[[], SpecIndex]
+) -> dict:
+    def compute():
+        return SpecFormatter.project_nodes(_closure_nodes(spec, apis, index))
+
+    return _cached(spec, "select_nodes", compute, _api_key(apis))
+
+
+def _cached(spec: Spec, kind: str, compute: Callable[[], Any], *args) -> Any:
+    # Values are shared between requests and must not be mutated by callers.
+    # Content-addressed keys never go stale and are shared by identical specs.
+    key = (spec.content_hash, SPEC_INDEX_VERSION, kind, *args)
+    return spec_cache.get_or_compute(key, lambda: timed_call(kind, compute))
+
+
+def _index_loader(spec: Spec, *columns) -> Callable[[], SpecIndex]:
+    """
+    Looks up the spec's index (with get_spec_index) on the first call only, so
+    that requests served from the cache do not query it at all. Ids are not
+    content-addressed, so the result is never cached across requests.
+    """
+    return functools.cache(lambda: get_spec_index(spec, *columns))
+
+
+def _load_slice(
+    spec: Spec, column, index: Optional[Callable[[], SpecIndex]] = None
+) -> dict:
+    if index is None:
+        index = _index_loader(spec, column)
+
+    def compute():
+        value = getattr(index(), column.key)
+        with timed("json_loads"):
+            return loads(value)
+
+    return _cached(spec, column.key, compute)
+
+
+def _operations(
+    spec: Spec, apis: list[ApiEndpoint], index: Callable[[], SpecIndex]
+) -> list[tuple]:
+    """
+    (path, verb, trimmed operation, components) of the given APIs that exist in
+    the spec, in spec order.
+    """
+
+    def compute():
+        keys = _api_key(apis)
+        if not keys:
+            return []
+        index_id = index().id
+        # Two parameters per key
+        batch_size = IN_CLAUSE_BATCH_SIZE // 2
+        rows = []
+        with timed("index_fetch"):
+            for start in range(0, len(keys), batch_size):
+                rows.extend(
+                    db.session.execute(
+                        select(
+                            SpecOperation.position,
+                            SpecOperation.path,
+                            SpecOperation.verb,
+                            SpecOperation.body,
+                            SpecOperation.sccs,
+                        ).where(
+                            SpecOperation.spec_index_id == index_id,
+                            tuple_(SpecOperation.path, SpecOperation.verb).in_(
+                                keys[start : start + batch_size]
+                            ),
+                        )
+                    )
+                )
+        rows.sort(key=lambda row: row.position)
+        with timed("json_loads"):
+            return [
+                (path, verb, loads(body), loads(sccs))
+                for _, path, verb, body, sccs in rows
+            ]
+
+    return _cached(spec, "operations", compute, _api_key(apis))
+
+
+def _closure_nodes(
+    spec: Spec, apis: list[ApiEndpoint], index: Callable[[], SpecIndex]
+) -> dict:
+    """
+    {$ref: node} for every ref reachable from the given operations.
+    """
+    sccs = sorted({scc for *_, sccs in _operations(spec, apis, index) for scc in sccs})
+    if not sccs:
+        return {}
+    index_id = index().id
+    rows = []
+    with timed("index_fetch"):
+        for start in range(0, len(sccs), IN_CLAUSE_BATCH_SIZE):
+            rows.extend(
+                db.session.execute(
+                    select(SpecNode.ref, SpecNode.node).where(
+                        SpecNode.spec_index_id == index_id,
+                        SpecNode.scc.in_(sccs[start : start + IN_CLAUSE_BATCH_SIZE]),
+                    )
+                )
+            )
+    # Sorted, since the order ends up in prompts and their cache keys
+    rows.sort(key=lambda row: row.ref)
+    with timed("json_loads"):
+        return {ref: loads(node) for ref, node in rows}
+
+
+def _api_key(apis: list[ApiEndpoint]) -> tuple:
+    return tuple(sorted({(api.path, api.verb.lower()) for api in apis}))
@@ -0,0 +1,34 @@
+import time
+from typing import Iterable, Iterator
+
+
+def coalesce_chunks(
+    chunks: Iterable[str], min_chars: int, max_delay: float
+) -> Iterator[str]:
+    """
+    Joins small chunks (single tokens, mostly) into fewer, larger ones. A chunk
+    is emitted once it reaches min_chars or once max_delay seconds have passed
+    since the previous one, whichever comes first; the first chunk is emitted
+    right away so that time to first byte is unaffected.
+
+    The delay is only checked when a chunk arrives: if the model stalls, the
+    pending text waits for the next chunk or the end of the stream.
+    """
+    pending = []
+    pending_chars = 0
+    last_emit = None
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_chars += len(chunk)
+        now = time.monotonic()
+        if (
+            last_emit is None
+            or pending_chars >= min_chars
+            or now - last_emit >= max_delay
+        ):
+            yield "".join(pending)
+            pending.clear()
+            pending_chars = 0
+            last_emit = now
+    if pending:
+        yield "".join(pending)
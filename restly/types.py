@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -13,18 +16,23 @@ class ApiEndpointList(BaseModel):
 class SpecLiteModel(BaseModel):
     id: int
     name: str
-
-
-class SpecModel(BaseModel):
-    id: int
-    name: str
-    url: str
-    content: str
+    # Only present when selected
+    url: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 
 class TutorialLiteModel(BaseModel):
     id: int
     name: str
+    # Only present when selected
+    spec_id: Optional[int] = None
+    query: Optional[str] = None
+    server: Optional[str] = None
+    content: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 
 class TutorialModel(BaseModel):
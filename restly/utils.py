@@ -1,6 +1,22 @@
 from typing import Optional
+from urllib.parse import unquote
 from .types import ApiEndpoint
-from collections import defaultdict
+from collections import defaultdict, deque
+
+# Keys of a path item that hold operations. The others (summary, description,
+# parameters, servers) apply to the path as a whole.
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+
+class _Selected:
+    """
+    Leaf of a pointer trie: a node selected as a whole.
+    """
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
 
 
 class SpecFormatter:
@@ -8,11 +24,16 @@ class SpecFormatter:
 
     def __init__(self, spec: dict):
         self._spec = spec
+        # Memoized pointer resolution and ref adjacency, keyed by $ref
+        self._nodes: dict[str, object] = {}
+        self._ref_edges: dict[str, list[str]] = {}
+        # Refs that ref_graph could not resolve (dangling or external)
+        self.unresolved_refs: set[str] = set()
 
     def trim_paths_only(self) -> Optional[dict]:
         if not self._spec or "paths" not in self._spec:
             return None
-        paths = self._spec["paths"]
+        paths = self._paths()
         trimmed_paths = {path: SpecFormatter._trim_path(paths[path]) for path in paths}
         return {
             "paths": trimmed_paths,
@@ -26,15 +47,18 @@ class SpecFormatter:
         for api in apis:
             apimap[api.path][api.verb.lower()] = True
 
+        spec_paths = self._paths()
         paths = {}
-        for path in self._spec["paths"]:
+        for path in spec_paths:
             if path not in apimap:
                 continue
             paths[path] = {}
-            for verb in self._spec["paths"][path]:
+            if not isinstance(spec_paths[path], dict):
+                continue
+            for verb in spec_paths[path]:
                 if verb not in apimap[path]:
                     continue
-                paths[path][verb] = self._spec["paths"][path][verb]
+                paths[path][verb] = spec_paths[path][verb]
 
         trimmed_paths = {path: SpecFormatter._trim_path(paths[path]) for path in paths}
         return {
@@ -45,73 +69,169 @@ class SpecFormatter:
         """
         Traverses the node and collects all $ref values recursively
         """
-        queue = [start_node]
-        result = set()
-
-        while len(queue) > 0:
-            node = queue.pop(0)
-            refs = SpecFormatter._collect_refs_from_node(node)
-            for ref in refs:
-                if ref not in result:
-                    result.add(ref)
-                    ref_node = SpecFormatter.get_node(
-                        self, self._spec, ref[2:].split("/")
-                    )
-                    queue.append(ref_node)
+        return set(self.ref_graph(start_node))
+
+    def ref_graph(self, start_node: dict) -> dict[str, list[str]]:
+        """
+        Ref adjacency graph ({$ref: [direct $refs]}) of every ref reachable from
+        the node. Each ref is resolved and scanned once, so cycles are harmless.
+        Refs that cannot be resolved are left out, along with the edges to them,
+        and recorded in unresolved_refs.
+        """
+        queue = deque(SpecFormatter._collect_refs_from_node(start_node))
+        edges_cache = self._ref_edges
+        unresolved = self.unresolved_refs
+        result = {}
+
+        while queue:
+            ref = queue.popleft()
+            if ref in result or ref in unresolved:
+                continue
+            edges = edges_cache.get(ref)
+            if edges is None:
+                try:
+                    node = self.resolve_ref(ref)
+                except (KeyError, NotImplementedError):
+                    unresolved.add(ref)
+                    continue
+                edges = edges_cache[ref] = SpecFormatter._collect_refs_from_node(node)
+            result[ref] = edges
+            queue.extend(edges)
+
+        if unresolved:
+            result = {
+                ref: [edge for edge in edges if edge in result]
+                for ref, edges in result.items()
+            }
         return result
 
+    def resolve_ref(self, ref: str):
+        """
+        Resolves a local $ref ("#/components/schemas/Pet") against the spec.
+        """
+        if ref not in self._nodes:
+            path = SpecFormatter.parse_pointer(ref)
+            self._nodes[ref] = SpecFormatter.get_node(self, self._spec, path)
+        return self._nodes[ref]
+
     def select_nodes(self, refs: set[str]) -> dict:
         """
         Selects nodes from the spec based on the refs. Preserves the structure of the spec.
         """
-        result = {}
-        for ref in refs:
-            path = ref[2:].split("/")
-            node = SpecFormatter.get_node(self, self._spec, path)
-            result = SpecFormatter._merge_node(result, node, path)
-        return result
+        return SpecFormatter.project_nodes({ref: self.resolve_ref(ref) for ref in refs})
 
     @staticmethod
-    def _merge_node(result: dict, node: dict, path: list[str]) -> dict:
-        if len(path) == 0:
-            return node
-        if path[0] not in result:
-            result[path[0]] = {}
-        result[path[0]] = SpecFormatter._merge_node(result[path[0]], node, path[1:])
-        return result
+    def project_nodes(nodes: dict[str, object]) -> dict:
+        """
+        Builds the subtree containing the given {$ref: node} entries in a single
+        pass. Selected nodes are shared with the source, not copied, and a ref
+        nested under another selected ref is already covered by it.
+        """
+        return SpecFormatter._materialize(SpecFormatter._pointer_trie(nodes))
 
+    @staticmethod
+    def parse_pointer(ref: str) -> list[str]:
+        """
+        Splits a local $ref into JSON Pointer tokens (RFC 6901), undoing the URI
+        fragment percent-encoding and the ~1 ("/") and ~0 ("~") escapes.
+        """
+        if ref == "#":
+            return []
+        if not ref.startswith("#/"):
+            raise NotImplementedError("External refs not supported yet")
+        tokens = ref[2:].split("/")
+        if "%" in ref:
+            tokens = [unquote(token) for token in tokens]
+        if "~" in ref:
+            tokens = [token.replace("~1", "/").replace("~0", "~") for token in tokens]
+        return tokens
+
+    @staticmethod
+    def _pointer_trie(nodes: dict[str, object]):
+        """
+        Trie of pointer tokens whose leaves are _Selected nodes. A selected
+        ancestor replaces whatever was collected below it.
+        """
+        root = {}
+        for ref, node in nodes.items():
+            path = SpecFormatter.parse_pointer(ref)
+            if len(path) == 0:
+                return _Selected(node)
+            parent = root
+            for token in path[:-1]:
+                parent = parent.setdefault(token, {})
+                if isinstance(parent, _Selected):
+                    break
+            else:
+                parent[path[-1]] = _Selected(node)
+        return root
+
+    @staticmethod
+    def _materialize(trie):
+        if isinstance(trie, _Selected):
+            return trie.node
+        return {
+            token: SpecFormatter._materialize(child) for token, child in trie.items()
+        }
+
+    @staticmethod
     def _collect_refs_from_node(node: dict) -> list[str]:
-        result = []
+        """
+        Direct $refs of a node, without duplicates. Does not descend into the
+        siblings of a $ref. External refs are rejected when resolved.
+        """
+        result = {}
+        if isinstance(node, dict):
+            SpecFormatter._scan_refs(node, result)
+        elif isinstance(node, list):
+            SpecFormatter._scan_list_refs(node, result)
+        return list(result)
+
+    @staticmethod
+    def _scan_refs(node: dict, result: dict):
         if "$ref" in node:
             ref = node["$ref"]
-            if ref.startswith("#/"):
-                result.append(ref)
-            else:
-                raise NotImplementedError("External refs not supported yet")
-        else:
-            for key in node:
-                if isinstance(node[key], dict):
-                    refs = SpecFormatter._collect_refs_from_node(node[key])
-                    result.extend(refs)
-                elif isinstance(node[key], list):
-                    for item in node[key]:
-                        if isinstance(item, dict):
-                            refs = SpecFormatter._collect_refs_from_node(item)
-                            result.extend(refs)
-        return result
+            if isinstance(ref, str):
+                result[ref] = None
+                return
+        for value in node.values():
+            if isinstance(value, dict):
+                SpecFormatter._scan_refs(value, result)
+            elif isinstance(value, list):
+                SpecFormatter._scan_list_refs(value, result)
+
+    @staticmethod
+    def _scan_list_refs(items: list, result: dict):
+        for item in items:
+            if isinstance(item, dict):
+                SpecFormatter._scan_refs(item, result)
+            elif isinstance(item, list):
+                SpecFormatter._scan_list_refs(item, result)
 
     @staticmethod
     def get_node(self, node: dict, path: list[str]):
-        if len(path) == 0:
-            return node
-        if path[0] not in node:
-            raise KeyError(f"Path not found: {path}")
-        return SpecFormatter.get_node(self, node[path[0]], path[1:])
+        for key in path:
+            if isinstance(node, dict) and key in node:
+                node = node[key]
+            elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+                node = node[int(key)]
+            else:
+                raise KeyError(f"Path not found: {path}")
+        return node
+
+    def _paths(self) -> dict:
+        # A spec with "paths": null (or worse) has no operations
+        paths = self._spec.get("paths")
+        return paths if isinstance(paths, dict) else {}
 
     @staticmethod
     def _trim_path(path_obj):
+        if not isinstance(path_obj, dict):
+            return {}
         return {
-            method: SpecFormatter._trim_method(path_obj[method]) for method in path_obj
+            method: SpecFormatter._trim_method(operation)
+            for method, operation in path_obj.items()
+            if method in HTTP_METHODS and isinstance(operation, dict)
         }
 
     @staticmethod
@@ -138,9 +258,8 @@ class SpecFormatter:
 
         # Extract per-path level security
         security_info["path_security"] = {}
-        if "paths" in self._spec:
-            for path, path_item in self._spec["paths"].items():
-                if "security" in path_item:
-                    security_info["path_security"][path] = path_item["security"]
+        for path, path_item in self._paths().items():
+            if isinstance(path_item, dict) and "security" in path_item:
+                security_info["path_security"][path] = path_item["security"]
 
         return security_info